@@ -1,10 +1,32 @@
-from .ambtimes import ambtimes
-from .clean import clean
-from .convert import convert
-from .split import split
-from .label import label
+import importlib
+import sys
+
 from .globals import *
 from .paths import *
-from .logging import setup_logging
 
-setup_logging()
+# Functions of the package, imported from their modules on first access so that importing `eadata`
+# (e.g. to run the CLI) doesn't import pandas, pyarrow or mne. Commands live in `eadata.commands`,
+# so importing their modules doesn't replace these attributes with the modules.
+_LAZY_ATTRS = {
+    'ambtimes': '.commands.ambtimes',
+    'clean': '.commands.clean',
+    'convert': '.commands.convert',
+    'split': '.commands.split',
+    'label': '.commands.label',
+    'label_sweep': '.commands.label',
+    'read': '.data',
+    'setup_logging': '.logging',
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+    # Cache on the package (its `globals` attribute is the `globals` module, hence `sys.modules`)
+    setattr(sys.modules[__name__], name, value)
+    return value
+
+
+def __dir__():
+    return sorted({*vars(sys.modules[__name__]), *_LAZY_ATTRS})
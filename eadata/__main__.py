@@ -1,21 +1,74 @@
+"""Command line interface of eadata, see `eadata --help`.
+
+Commands are only imported when they're run, as most of them import pandas, pyarrow or mne, so
+`eadata --help` and light commands such as `split` start quickly.
+"""
+import importlib
+import os
+import sys
+from typing import Callable
+
 import fire
 
-from . import ambtimes
-from . import clean
-from . import convert
-from . import split
-from . import label
+from .instrumentation import PROFILE_ENV
+from .logging import setup_logging
+
+# Module and function of each command, along with its summary shown in `eadata --help`
+COMMANDS = {
+    'convert': (
+        '.commands.convert',
+        'convert',
+        "Converts all sessions from EDF files to parquet files.",
+    ),
+    'ambtimes': (
+        '.commands.ambtimes',
+        'ambtimes',
+        "Check local times in edf files and sztimes for DST ambiguities.",
+    ),
+    'split': ('.commands.split', 'split', "Create train/test split across sessions in parquet."),
+    'label': (
+        '.commands.label',
+        'label',
+        "Generate labels csv mapping parquet files to integers and augments dataset.",
+    ),
+    'sweep': (
+        '.commands.label',
+        'label_sweep',
+        "Generate labels csvs for every combination of labelling parameters.",
+    ),
+    'clean': ('.commands.clean', 'clean', "Removes augmented samples from splits and labels csvs."),
+}
 
 
 def main():
+    # Global flag to run commands under cProfile, see `instrumentation`
+    if '--profile' in sys.argv:
+        sys.argv.remove('--profile')
+        os.environ[PROFILE_ENV] = '1'
+
+    setup_logging()
+
+    # Only the command being run is imported, the rest are listed by their summary
+    command = next((arg for arg in sys.argv[1:] if not arg.startswith('-')), None)
     fire.Fire({
-        'convert': convert,
-        'ambtimes': ambtimes,
-        'split': split,
-        'label': label,
-        'clean': clean,
+        name: _load_command(name) if name == command else _lazy_command(name)
+        for name in COMMANDS
     })
 
 
+def _load_command(name: str) -> Callable:
+    module_name, func_name, _ = COMMANDS[name]
+    return getattr(importlib.import_module(module_name, __package__), func_name)
+
+
+def _lazy_command(name: str) -> Callable:
+    """Placeholder of a command in `eadata --help`, which imports the command when it's called."""
+    def command(*args, **kwargs):
+        return _load_command(name)(*args, **kwargs)
+
+    command.__doc__ = COMMANDS[name][2]
+    return command
+
+
 if __name__ == '__main__':
     main()
@@ -1 +1,2 @@
 from .get_file_start_times import get_file_start_times
+from .get_edf_catalog import get_edf_catalog
@@ -0,0 +1,110 @@
+"""Header-only catalog of EDF files, cached on disk."""
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from eadata.data import read_edf_header
+from eadata.paths import ARTIFACTS_PATH, EDF_PATH
+
+logger = logging.getLogger(__name__)
+
+CATALOG_COLUMNS = [
+    'filepath',
+    'pid',
+    'valid',
+    'start',
+    'n_records',
+    'record_duration',
+    'duration',
+    'sfreqs',
+    'size',
+    'mtime_ns',
+]
+
+
+def get_edf_catalog(patient_ids: List[str], workers: Optional[int] = None) -> pd.DataFrame:
+    """Get header metadata of every EDF file of some patients.
+
+    Only the EDF headers are read, using a thread pool. Results are cached per patient in
+    `artifacts/<pid>/edf_catalog.json`, keyed by path (relative to EDF_PATH), size and mtime, so
+    only new or modified files are read again.
+
+    Args:
+        patient_ids: Patient IDs.
+        workers: Number of threads used to read headers (defaults to 4 x number of CPUs).
+
+    Returns:
+        Dataframe with columns CATALOG_COLUMNS and a row per EDF file. `start` is the (naive, local)
+        start time in the header, `duration` is in seconds, and `sfreqs` maps signal labels to
+        sample rates. Files with a malformed header, or whose size doesn't match their header, are
+        not `valid` and only have `size` and `mtime_ns` set.
+    """
+    workers = workers or 4 * (os.cpu_count() or 1)
+    rows = []
+    for pid in patient_ids:
+        pid = str(pid)
+        catalog_path = Path(ARTIFACTS_PATH) / pid / 'edf_catalog.json'
+        catalog = {}
+        if catalog_path.exists():
+            with open(str(catalog_path), 'r') as f:
+                catalog = json.load(f)
+
+        edf_files = [
+            fp for fp in (Path(EDF_PATH) / pid).glob('**/*.edf') if fp.name[0] != '.'
+        ]
+        stats = {str(fp.relative_to(EDF_PATH)): fp.stat() for fp in edf_files}
+        stale = [
+            key for key, stat in stats.items() if key not in catalog
+            or catalog[key]['size'] != stat.st_size or catalog[key]['mtime_ns'] != stat.st_mtime_ns
+        ]
+        logger.info(
+            f"Reading {len(stale)} EDF headers for {pid = } ({len(stats) - len(stale)} cached)")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            entries = executor.map(lambda key: _scan_header(Path(EDF_PATH) / key), stale)
+            for key, entry in zip(stale, entries):
+                entry.update(size=stats[key].st_size, mtime_ns=stats[key].st_mtime_ns)
+                catalog[key] = entry
+
+        catalog = {key: catalog[key] for key in sorted(stats)}
+        if len(stale) > 0 or len(catalog) != len(stats):
+            _save_catalog(catalog, catalog_path)
+
+        for key, entry in catalog.items():
+            rows.append({'filepath': Path(EDF_PATH) / key, 'pid': pid, **entry})
+
+    df = pd.DataFrame(rows, columns=CATALOG_COLUMNS)
+    df['start'] = pd.to_datetime(df['start'])
+    return df
+
+
+def _scan_header(fp: Path) -> Dict[str, Any]:
+    """Reads catalog entry of an EDF file from its header."""
+    try:
+        header = read_edf_header(fp)
+        start = header['meas_date'].replace(tzinfo=None)
+    except Exception:
+        return {'valid': False}
+
+    signals = header['signals']
+    return {
+        'valid': True,
+        'start': start.isoformat(),
+        'n_records': header['n_records'],
+        'record_duration': header['record_duration'],
+        'duration': header['n_records'] * header['record_duration'],
+        'sfreqs': {header['label'][i]: header['sfreq'][i] for i in signals},
+    }
+
+
+def _save_catalog(catalog: Dict[str, Dict[str, Any]], catalog_path: Path) -> None:
+    catalog_path.parent.mkdir(exist_ok=True, parents=True)
+    tmp_path = catalog_path.with_name(catalog_path.name + '.tmp')
+    with open(str(tmp_path), 'w') as f:
+        json.dump(catalog, f, indent=2)
+    os.replace(tmp_path, catalog_path)
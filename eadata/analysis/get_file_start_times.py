@@ -1,47 +1,73 @@
+import os
 import sys
 import logging
 import multiprocessing as mp
-from typing import List
+from functools import partial
+from typing import List, Optional
 from pathlib import Path
 import warnings
 
 from tqdm import tqdm
-import mne
 import pandas as pd
 
 from eadata.paths import EDF_PATH
+from eadata.data import get_edf_reader
+from .get_edf_catalog import get_edf_catalog
 
-mne.set_log_level(False)
 logger = logging.getLogger(__name__)
 
-def _get_start(fp):
+def _get_start(fp, backend='mne'):
     tz = None
     with warnings.catch_warnings():
         warnings.simplefilter('error')
         try:
-            f = mne.io.read_raw_edf(str(fp))
+            f = get_edf_reader(backend)(str(fp))
             return f.info['meas_date'].replace(tzinfo=tz)
         except:
             return None
 
 
-def get_file_start_times(patient_ids: List[str], multiproc: bool = False):
+def get_file_start_times(
+    patient_ids: List[str],
+    multiproc: bool = False,
+    backend: str = 'native',
+    workers: Optional[int] = None,
+):
+    """Get start time (local) of every EDF file of some patients.
+
+    With the 'native' backend, start times are taken from the cached header catalog (see
+    `get_edf_catalog`), so only new or modified files are read.
+
+    Args:
+        patient_ids: Patient IDs.
+        multiproc: Whether to read files in parallel.
+        backend: EDF reader to use, either 'native' or 'mne'.
+        workers: Number of threads (native) or processes (mne) to use if `multiproc`.
+
+    Returns:
+        Dataframe with columns `filepath` and `start` (NaT if the file can't be read).
+    """
+    if backend == 'native':
+        catalog = get_edf_catalog(patient_ids, workers=workers if multiproc else 1)
+        return catalog[['filepath', 'start']]
+
     edf_files = []
     for pid in patient_ids:
         files_glob = (EDF_PATH / pid).glob('**/*')
         edf_files.extend([i for i in files_glob if i.suffix == '.edf' and i.name[0] != '.'])
 
+    get_start = partial(_get_start, backend=backend)
     if not multiproc:
         logger.info("Getting file start times using single process")
         starts = []
         for fp in tqdm(edf_files, ncols=80):
-            starts.append(_get_start(fp))
+            starts.append(get_start(fp))
     else:
         logger.info(f"Getting file start times using parallel processes")
-        with mp.Pool(6) as pool:
+        with mp.Pool(workers or os.cpu_count()) as pool:
             starts = list(
                 tqdm(
-                    pool.imap(_get_start, edf_files, chunksize=50),
+                    pool.imap(get_start, edf_files, chunksize=50),
                     desc='Getting file start times',
                     total=len(edf_files),
                     file=sys.stdout,
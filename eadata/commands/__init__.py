@@ -0,0 +1,6 @@
+"""Commands of the eadata CLI.
+
+Commands are exposed as functions of `eadata` (e.g. `eadata.convert`), which import them lazily.
+This package doesn't import them, and they live in their own package so that importing a command
+module doesn't rebind the function of the same name on `eadata` to the module.
+"""
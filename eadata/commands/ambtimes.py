@@ -15,8 +15,8 @@ from datetime import datetime
 
 import pandas as pd
 
-from .globals import PATIENT_IDS
-from .paths import ARTIFACTS_PATH
+from ..globals import PATIENT_IDS
+from ..paths import ARTIFACTS_PATH
 from eadata.labels import load_sztimes
 from eadata.analysis import get_file_start_times
 
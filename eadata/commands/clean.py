@@ -0,0 +1,69 @@
+from pathlib import Path
+import logging
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..data.read_sample import get_augmented_samples_path
+from ..globals import PATIENT_IDS, SPLIT_NAMES, TIMESTAMP_FORMAT, SRATE
+from ..instrumentation import instrumented, stage
+from ..paths import ARTIFACTS_PATH, get_split_session_dirs, is_split
+
+logger = logging.getLogger(__name__)
+
+
+@instrumented('clean')
+def clean(
+    patient_id: str,
+    forecast_window: int = 60 * 60,
+    setback: int = 15 * 60,
+    step_size: int = 1 * 60,
+):
+    """Removes augmented samples from splits and labels csvs.
+
+    Both augmented samples written to disk and virtual augmented samples (see `label`) are removed.
+
+    Requires split converted data to be labeled. See `convert`, `split`, and `label`
+
+    Args:
+        patient_id: patient id.
+    """
+
+    assert str(patient_id) in PATIENT_IDS, f"{patient_id} not in {PATIENT_IDS}"
+    assert is_split(patient_id), \
+        "Not all splits exist, run `eadata split <pid> <train_prop> <test_prop>` first."
+    assert all((ARTIFACTS_PATH / f'{patient_id}_{split}_labels.csv').exists() for split in SPLIT_NAMES), \
+        "Labels don't exist, run `eadata label <pid>` first."
+
+    all_files = sorted(
+        [
+            fp for session_dirs in get_split_session_dirs(patient_id).values()
+            for session_dir in session_dirs for fp in session_dir.glob('*.parquet')
+        ],
+        key=lambda fp: fp.stem,
+    )
+
+    files_to_delete = [
+        fp for fp in all_files
+        if pd.to_datetime(fp.stem, format=TIMESTAMP_FORMAT).minute != 0
+    ]
+
+    with stage('delete_augmented') as counters:
+        for fp in files_to_delete:
+            counters['bytes'] += fp.stat().st_size
+            fp.unlink()
+        counters['rows'] += len(files_to_delete)
+
+    is_augmented = lambda fp: pd.to_datetime(Path(fp).stem, format=TIMESTAMP_FORMAT).minute != 0
+    for split_name in SPLIT_NAMES:
+        split_labels_path = ARTIFACTS_PATH / f'{patient_id}_{split_name}_labels.csv'
+        labels_df = pd.read_csv(split_labels_path)
+        labels_df = labels_df[~labels_df.filepath.apply(is_augmented)].reset_index(drop=True)
+        with stage('write_labels') as counters:
+            labels_df.to_csv(split_labels_path, index=False)
+            counters['rows'] += len(labels_df)
+
+        get_augmented_samples_path(patient_id, split_name).unlink(missing_ok=True)
+
+
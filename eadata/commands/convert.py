@@ -0,0 +1,338 @@
+from pathlib import Path
+import logging
+import os
+import queue
+import sys
+import multiprocessing as mp
+from functools import partial
+from multiprocessing.pool import Pool
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tqdm import tqdm
+
+from ..data import (
+    LAYOUTS,
+    PARQUET_PROFILES,
+    get_session_dataframe,
+    read_edf_header,
+    save_session_to_parquet,
+    stream_session_to_parquet,
+    write_dataset_metadata,
+)
+from ..data.native_blocks import STORAGE_MODES
+from ..data.save_session_to_parquet import get_session_output_dir
+from ..data.session_buffer import COLUMNS
+from ..globals import SRATE
+from ..instrumentation import instrumented, merge_records, stage, worker_records
+from ..manifest import (
+    get_entry_options,
+    get_session_fingerprint,
+    get_session_key,
+    is_session_unchanged,
+    load_manifest,
+    make_manifest_entry,
+    remove_session_outputs,
+    save_manifest,
+)
+from ..paths import (
+    DATASET_PATH,
+    EDF_PATH,
+    ARTIFACTS_PATH,
+    get_session_index,
+    write_dodgy_sessions,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bytes held per grid sample while converting: float32 buffer, plus a datetime index and a copy for
+# the arrow table when a whole session is loaded into memory.
+BUFFER_BYTES_PER_SAMPLE = 4 * len(COLUMNS)
+SESSION_BYTES_PER_SAMPLE = 2 * BUFFER_BYTES_PER_SAMPLE + 8
+
+
+@instrumented('convert')
+def convert(
+    patient_id: str,
+    multiproc: bool = True,
+    backend: str = 'native',
+    stream: bool = True,
+    force: bool = False,
+    workers: Optional[int] = None,
+    memory_budget: Optional[float] = None,
+    parquet_profile: str = 'default',
+    layout: str = 'sessions',
+    storage: str = 'grid',
+) -> None:
+    """Converts all sessions from EDF files to parquet files.
+
+    Converts EDF files in `edf/<patient_id>/<session_timestamp>/*.edf` to Parquet files in
+    `parquet/<patient_id>/<session_timestamp>/*.parquet`. EDF files are saved per channel group,
+    whereas parquet files are saved per block of time.
+
+    Conversion is incremental: each converted session is recorded in a manifest in
+    `artifacts/<patient_id>/convert_manifest.json` along with the size, mtime and header hash of its
+    EDF files. Sessions which are unchanged since a previous run are skipped, so an interrupted run
+    can be resumed by running it again. Sessions which were already moved by `split` should be
+    re-split after they're reconverted.
+
+    Sessions are converted largest first (by EDF size), so that long sessions don't end up running
+    alone at the end. If `memory_budget` is set, a session is only started once its estimated memory
+    footprint fits alongside the sessions already running.
+
+    With `layout='hive'`, sessions are instead written as a hive-partitioned dataset in
+    `parquet/dataset/pid=<patient_id>/session=<session_ind>/date=<date>/*.parquet`, and the
+    `_metadata` and `_common_metadata` summary files at the root of the dataset are rewritten after
+    converting (or after removing hive outputs of sessions reconverted in another layout). The hive
+    layout is for reading with `pyarrow.dataset`, and only supports grid storage; `split`, `label`
+    and `clean` require the 'sessions' layout.
+
+    With `storage='native'`, each channel group is stored at its native sample rate rather than on
+    the `SRATE` grid (see `data.native_blocks`), which is much smaller as most channels are low
+    rate. Such blocks are placed back on the grid when read with `data.read_block` or `read`.
+
+    Each channel group is placed on the grid at the nearest sample to its start time.
+
+    Sessions converted with a different layout or storage are reconverted (and their old outputs
+    removed).
+
+    Some sessions may be dodgy, in which case they are skipped and recorded to artifacts.
+
+    Wall time, rows and bytes of each stage (reading EDFs, building tables, writing parquet) are
+    reported per session to `artifacts/reports/convert_<patient_id>.json`, see `instrumentation`.
+
+    Args:
+        patient_id: Patient ID to convert.
+        multiproc: Whether to use multiprocessing
+        backend: EDF reader to use, either 'native' or 'mne'.
+        stream: Whether to read and write one hour block at a time (bounded memory) instead of
+            loading each session into memory.
+        force: Whether to reconvert all sessions, even if they're unchanged.
+        workers: Number of worker processes (defaults to number of CPUs).
+        memory_budget: Maximum estimated memory (in GB) of sessions being converted at once.
+        parquet_profile: Name of parquet write options to use (see `PARQUET_PROFILES`), e.g.
+            'minute' for one row group per minute with zstd and byte-stream-split floats.
+        layout: Output layout, either 'sessions' or 'hive'.
+        storage: Storage mode of channels, either 'grid' or 'native' (requires `stream`).
+    """
+    patient_id = str(patient_id)
+    assert parquet_profile in PARQUET_PROFILES, \
+        f"{parquet_profile} not in {list(PARQUET_PROFILES)}"
+    assert layout in LAYOUTS, f"{layout} not in {LAYOUTS}"
+    assert storage in STORAGE_MODES, f"{storage} not in {STORAGE_MODES}"
+    assert stream or storage == 'grid', "Native storage is only supported when streaming."
+    assert layout != 'hive' or storage == 'grid', "The hive layout only supports grid storage."
+    options = {'layout': layout, 'storage': storage}
+
+    with stage('index_sessions') as counters:
+        sessions = get_session_index(patient_id)
+        session_dirs = [EDF_PATH / s['key'] for s in sessions]
+        session_inds = {d: s['ind'] for d, s in zip(session_dirs, sessions)}
+
+        manifest = load_manifest(patient_id)
+        manifest = {k: v for k, v in manifest.items() if (EDF_PATH / k) in session_inds}
+        fingerprints = {d: get_session_fingerprint(d) for d in session_dirs}
+        counters['rows'] += len(session_dirs)
+
+    pending_dirs = [
+        d for d in session_dirs if force or not is_session_unchanged(
+            manifest.get(get_session_key(d)),
+            session_inds[d],
+            fingerprints[d],
+            options,
+        )
+    ]
+    edf_size = lambda d: sum(f['size'] for f in fingerprints[d].values() if f is not None)
+    pending_dirs = sorted(pending_dirs, key=edf_size, reverse=True)
+    logger.info(
+        f"Converting {len(pending_dirs)} sessions "
+        f"({len(session_dirs) - len(pending_dirs)} unchanged sessions skipped)")
+
+    removed_hive = False
+    for session_dir in pending_dirs:
+        entry = manifest.pop(get_session_key(session_dir), None)
+        removed_hive |= get_entry_options(entry)['layout'] == 'hive'
+        remove_session_outputs(
+            entry,
+            get_session_output_dir(patient_id, session_inds[session_dir], layout),
+        )
+    save_manifest(manifest, patient_id)
+
+    convert_session = partial(
+        _convert_session,
+        backend=backend,
+        stream=stream,
+        parquet_profile=parquet_profile,
+        layout=layout,
+        storage=storage,
+    )
+
+    def record(session_dir: Path, outputs: Optional[List[Path]], records: List[Dict]) -> None:
+        merge_records(records)
+        # Save after every session so progress survives an interrupted run
+        entry = make_manifest_entry(
+            session_inds[session_dir],
+            fingerprints[session_dir],
+            outputs,
+            options,
+        )
+        manifest[get_session_key(session_dir)] = entry
+        save_manifest(manifest, patient_id)
+
+    if not multiproc:
+        logger.info("Converting sessions using single process")
+        for session_dir in tqdm(pending_dirs, ncols=80):
+            record(*convert_session(session_dir))
+
+    else:
+        workers = max(1, min(workers or os.cpu_count(), len(pending_dirs)))
+        logger.info(f"Converting sessions using {workers} parallel processes")
+        footprints = {d: _estimate_session_memory(d, stream) for d in pending_dirs}
+        budget = None if memory_budget is None else memory_budget * 1024**3
+        with mp.Pool(workers) as pool, tqdm(
+                desc='Converting sessions',
+                total=len(pending_dirs),
+                file=sys.stdout,
+                ncols=80,
+        ) as pbar:
+            for result in _imap_scheduled(pool, convert_session, pending_dirs, workers, footprints,
+                                          budget):
+                record(*result)
+                pbar.update()
+
+    if layout == 'hive' or removed_hive:
+        logger.info(f"Writing dataset metadata to {DATASET_PATH}")
+        write_dataset_metadata()
+
+    dodgy_sessions = [
+        EDF_PATH / key for key, entry in sorted(manifest.items()) if entry['status'] == 'dodgy'
+    ]
+    if len(dodgy_sessions) > 0:
+        logger.warning(f"{len(dodgy_sessions)} sessions are dodgy, skipping")
+        write_dodgy_sessions(dodgy_sessions, patient_id)
+
+
+def _convert_session(
+    session_dir: Path,
+    backend: str = 'native',
+    stream: bool = True,
+    parquet_profile: str = 'default',
+    layout: str = 'sessions',
+    storage: str = 'grid',
+) -> Tuple[Path, Optional[List[Path]], List[Dict]]:
+    """Helper function for multiprocessing.
+
+    Args:
+        session_dir: Path to session directory.
+        backend: EDF reader to use.
+        stream: Whether to convert one hour block at a time.
+        parquet_profile: Name of parquet write options to use.
+        layout: Output layout.
+        storage: Storage mode of channels.
+
+    Returns:
+        Tuple of session_dir, paths of the parquet files written, and stage records of the session
+        (see `instrumentation`). If unsucessful, paths are None.
+    """
+    outputs = None
+    session = get_session_key(session_dir)
+    with worker_records() as records, stage('convert_session', session=session):
+        if stream:
+            outputs = stream_session_to_parquet(
+                session_dir,
+                backend=backend,
+                parquet_profile=parquet_profile,
+                layout=layout,
+                storage=storage,
+            )
+        else:
+            df = get_session_dataframe(session_dir, backend=backend)
+            if df is not None:
+                outputs = save_session_to_parquet(
+                    df,
+                    session_dir,
+                    parquet_profile=parquet_profile,
+                    layout=layout,
+                )
+    return session_dir, outputs, records
+
+
+def _imap_scheduled(
+    pool: Pool,
+    func: Callable,
+    tasks: List[Path],
+    workers: int,
+    footprints: Dict[Path, int],
+    budget: Optional[float] = None,
+):
+    """Runs tasks on a pool in the given order, subject to a memory budget.
+
+    A task is only submitted when a worker is free and its footprint fits within `budget` alongside
+    the tasks already running. Tasks are started strictly in order, so a large task waits for memory
+    to free up rather than being overtaken by smaller ones. A task that exceeds the budget on its
+    own is run once nothing else is running.
+
+    Args:
+        pool: Worker pool.
+        func: Function to apply to each task.
+        tasks: Tasks in the order they should be started.
+        workers: Number of tasks to run at once.
+        footprints: Estimated memory of each task in bytes.
+        budget: Memory budget in bytes (no limit if None).
+
+    Yields:
+        Results of `func` in order of completion.
+    """
+    done = queue.Queue()
+    pending = list(reversed(tasks))
+    running = {}
+
+    while pending or running:
+        while pending and len(running) < workers:
+            task = pending[-1]
+            in_use = sum(running.values())
+            if running and budget is not None and in_use + footprints[task] > budget:
+                break
+            pending.pop()
+            running[task] = footprints[task]
+            pool.apply_async(
+                func,
+                (task, ),
+                callback=lambda result, task=task: done.put((task, result, None)),
+                error_callback=lambda error, task=task: done.put((task, None, error)),
+            )
+
+        task, result, error = done.get()
+        running.pop(task)
+        if error is not None:
+            raise error
+        yield result
+
+
+def _estimate_session_memory(session_dir: Path, stream: bool = True) -> int:
+    """Estimates peak memory used to convert a session, in bytes.
+
+    Based on the duration of the longest EDF file in the session (from the EDF headers). When
+    streaming, only a couple of hour blocks are held at once regardless of duration.
+
+    Args:
+        session_dir: Path to session directory.
+        stream: Whether the session is converted one hour block at a time.
+
+    Returns:
+        Estimated memory in bytes.
+    """
+    block_len = 60 * 60 * SRATE
+    if stream:
+        return 2 * block_len * BUFFER_BYTES_PER_SAMPLE
+
+    duration = 0
+    for fp in session_dir.glob('Empatica-*.edf'):
+        try:
+            header = read_edf_header(fp)
+        except (ValueError, OSError):
+            continue
+        duration = max(duration, header['n_records'] * header['record_duration'])
+
+    # Session is padded out to whole hours at either end
+    n_samples = int(duration * SRATE) + 2 * block_len
+    return n_samples * SESSION_BYTES_PER_SAMPLE
@@ -0,0 +1,401 @@
+from pathlib import Path
+import itertools
+import pickle
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+from ..data import PARQUET_PROFILES, TimeAxis, read_block, write_table_atomic
+from ..data.native_blocks import get_block_layout, to_native_table
+from ..data.read_sample import AUGMENTED_SAMPLES_COLUMNS, get_augmented_samples_path
+from ..globals import PATIENT_IDS, SPLIT_NAMES, TIMESTAMP_FORMAT, SRATE
+from ..instrumentation import instrumented, stage
+from ..paths import PARQUET_PATH, SZTIMES_PATH, ARTIFACTS_PATH, get_split_session_dirs, is_split
+
+logger = logging.getLogger(__name__)
+
+
+@instrumented('label')
+def label(
+    patient_id: str,
+    forecast_window: int = 60 * 60,
+    setback: int = 15 * 60,
+    lead_gap: int = 4 * 60 * 60,
+    virtual: bool = False,
+    parquet_profile: str = 'default',
+):
+    """Generate labels csv mapping parquet files to integers and augments dataset.
+
+    Requires converted parquet dataset to be split, see `split` and `convert`.
+
+    Saves csv files mapping filenames to labels in PARQUET_PATH.
+
+    Augmented samples (hour windows offset from the hour blocks) are written as parquet files next
+    to the hour blocks they're taken from. If `virtual`, they're instead recorded as rows in
+    `<pid>_<split>_augmented.csv` in ARTIFACTS_PATH and can be read with `data.read_sample`; the
+    labels csv refers to them by the same filepath they would have on disk.
+
+    Args:
+        patient_id: patient id.
+        forecast_window: size of forecast window in seconds.
+        setback: Time in between forecast window and sztime in seconds (0 to disable setback).
+        lead_gap: Size of window where following seizures are dropped (-1 to disable dropping).
+        virtual: Whether to record augmented samples in a manifest instead of writing them.
+        parquet_profile: Name of parquet write options for augmented samples, see
+            `data.PARQUET_PROFILES`.
+    """
+
+    assert str(patient_id) in PATIENT_IDS, f"{patient_id} not in {PATIENT_IDS}"
+    assert parquet_profile in PARQUET_PROFILES, \
+        f"{parquet_profile} not in {list(PARQUET_PROFILES)}"
+    assert is_split(patient_id), \
+        "Not all splits exist, run `eadata split <pid> <train_prop>,<test_prop>` first."
+
+    with stage('load_sztimes') as counters:
+        sztimes = _load_lead_sztimes(patient_id, lead_gap)
+        counters['rows'] += len(sztimes)
+
+    positive_times = _get_positive_times(sztimes, forecast_window, setback)
+    split_of_file, files_by_timestamp = _get_split_files(patient_id)
+    all_files = sorted(split_of_file, key=lambda fp: fp.stem)
+
+    # Decoded hour blocks used to create augmented samples, keyed by path
+    block_cache = {}
+
+    # Create csv for each split
+    for split_name in SPLIT_NAMES:
+        logger.info(f'Creating labels csv for patient_id {patient_id} {split_name} split')
+        split_labels_path = ARTIFACTS_PATH / f'{patient_id}_{split_name}_labels.csv'
+        split_labels_path.parent.mkdir(exist_ok=True, parents=True)
+
+        # Remove exising labels csv and virtual samples if present
+        if split_labels_path.exists():
+            split_labels_path.unlink()
+        augmented_samples_path = get_augmented_samples_path(patient_id, split_name)
+        augmented_samples_path.unlink(missing_ok=True)
+        augmented_samples = []
+
+        # Get filenames in split ('<pid>/<session>/<file>')
+        split_files = [
+            Path().joinpath(*fp.parts[-3:]) for fp in all_files if split_of_file[fp] == split_name
+        ]
+
+        # Create augmented samples for `positive_times` that are not in the split
+        augment_windows = _get_augment_windows(
+            positive_times,
+            split_files,
+            split_of_file,
+            files_by_timestamp,
+        )
+        logger.info(f"Creating augmented samples for {split_name} split")
+        with stage('augment') as counters:
+            for t, filepath, next_filepath in tqdm(augment_windows):
+                session_dir = filepath.parent
+                hour = TimeAxis.from_time(t.floor('H'), SRATE, 60 * 60 * SRATE)
+                offset = hour.index(t)
+                pq_path = session_dir / f"{t.strftime(TIMESTAMP_FORMAT)}.parquet"
+                split_files.append(Path().joinpath(*pq_path.parts[-3:]))
+
+                counters['rows'] += 1
+                if virtual:
+                    augmented_samples.append({
+                        'filepath': str(split_files[-1]),
+                        'session': str(Path().joinpath(*session_dir.parts[-2:])),
+                        'start': t.strftime(TIMESTAMP_FORMAT),
+                        'source': str(filepath.relative_to(PARQUET_PATH)),
+                        'sample_offset': offset,
+                        'length': len(hour),
+                    })
+                    continue
+
+                # Blocks before this hour won't be needed again, as times are visited in order
+                for fp in [fp for fp in block_cache if block_cache[fp][0] < t.floor('H')]:
+                    del block_cache[fp]
+
+                # Slice requested hour window out of this hour and the next
+                columns, block, native_layout = _read_block(filepath, t.floor('H'), block_cache)
+                _, next_block, _ = _read_block(next_filepath, t.ceil('H'), block_cache)
+                window = np.concatenate([block[:, offset:], next_block[:, :offset]], axis=1)
+
+                # Save window, in the same storage mode as the block it was taken from
+                if native_layout is not None:
+                    table = to_native_table(window, columns, native_layout)
+                else:
+                    table = pa.Table.from_pandas(pd.DataFrame(window.transpose(), columns=columns))
+                write_table_atomic(table, pq_path, parquet_profile)
+
+        if len(augmented_samples) > 0:
+            augmented_samples_df = pd.DataFrame(
+                augmented_samples,
+                columns=AUGMENTED_SAMPLES_COLUMNS,
+            )
+            augmented_samples_df.to_csv(augmented_samples_path, index=False)
+
+        # Get label for each file arranged in a dataframe
+        labels_df = pd.DataFrame(sorted(split_files), columns=['filepath'])
+        file_times = _get_file_times(labels_df.filepath)
+        labels_df['label'] = _get_labels(file_times, sztimes, forecast_window, setback)
+
+        if not labels_df.label.any():
+            logger.warning(f"No labels for {patient_id} {split_name}")
+
+        with stage('write_labels') as counters:
+            labels_df.to_csv(split_labels_path, index=False)
+            counters['rows'] += len(labels_df)
+
+
+def _get_positive_times(sztimes: pd.Series, forecast_window: int, setback: int) -> pd.Series:
+    """Get UTC times (minute floored) of samples which are labelled positive.
+
+    Args:
+        sztimes: Seizure times (UTC).
+        forecast_window: size of forecast window in seconds.
+        setback: Time in between forecast window and sztime in seconds.
+
+    Returns:
+        Series of unique positive times.
+    """
+    window = pd.timedelta_range(pd.Timedelta(seconds=setback), 0, freq='-60s', closed='right')
+    # Get times where seizure occurs in next `setback` seconds, offset to corresponding parquet
+    # file times
+    forecast_times = (
+        sztimes.dt.floor('1min').values[:, None] - window.values[None, :]
+        - np.timedelta64(forecast_window, 's')
+    )
+    # Windows of seizures less than `setback` apart overlap, so each time is only sampled once
+    positive_times = pd.Series(pd.to_datetime(forecast_times.ravel(), utc=True))
+    return positive_times.drop_duplicates().reset_index(drop=True)
+
+
+def _get_split_files(patient_id: str) -> Tuple[Dict[Path, str], Dict[str, Path]]:
+    """Get the parquet files of a patient's splits.
+
+    Args:
+        patient_id: patient id.
+
+    Returns:
+        Split of each parquet file, resolved from where its session was moved to or the split
+        manifest, and the files indexed by timestamp (first file in path order if a timestamp is
+        repeated).
+    """
+    split_of_file = {
+        fp: split_name
+        for split_name, session_dirs in get_split_session_dirs(patient_id).items()
+        for session_dir in session_dirs for fp in session_dir.glob('*.parquet')
+    }
+    files_by_timestamp = {}
+    for fp in sorted(split_of_file):
+        files_by_timestamp.setdefault(fp.stem, fp)
+    return split_of_file, files_by_timestamp
+
+
+def _get_augment_windows(
+    positive_times: pd.Series,
+    split_files: List[Path],
+    split_of_file: Dict[Path, str],
+    files_by_timestamp: Dict[str, Path],
+) -> List[Tuple[pd.Timestamp, Path, Path]]:
+    """Get the augmented samples to create for the positive times of a split.
+
+    A sample is created for each positive time which isn't the start of a file in the split, and
+    whose hour block and following hour block are both in the same session of the split.
+
+    Args:
+        positive_times: Positive times, see `_get_positive_times`.
+        split_files: Files in split ('<pid>/<session>/<file>').
+        split_of_file: Split of each parquet file, see `_get_split_files`.
+        files_by_timestamp: Parquet files indexed by timestamp, see `_get_split_files`.
+
+    Returns:
+        List of start time, hour block and following hour block of each sample, sorted by time.
+    """
+    split_times = [
+        pd.to_datetime(fp.stem, format=TIMESTAMP_FORMAT, utc=True) for fp in split_files
+    ]
+    split_mask = positive_times.dt.floor('H').isin(split_times)
+    augment_times = positive_times[split_mask & ~positive_times.isin(split_times)].sort_values()
+
+    windows = []
+    for t in augment_times:
+        # Skip timestamp if there's no files that match request
+        filepath = files_by_timestamp.get(t.floor('H').strftime(TIMESTAMP_FORMAT))
+        if filepath is None:
+            continue
+
+        # skip timestamp if next file is not in the same session
+        next_filepath = filepath.parent / f"{t.ceil('H').strftime(TIMESTAMP_FORMAT)}.parquet"
+        if next_filepath not in split_of_file:
+            continue
+        windows.append((t, filepath, next_filepath))
+    return windows
+
+
+def _read_block(
+    filepath: Path,
+    block_start: pd.Timestamp,
+    block_cache: Dict[Path, Tuple[pd.Timestamp, List[str], np.ndarray, Optional[Dict]]],
+) -> Tuple[List[str], np.ndarray, Optional[Dict]]:
+    """Reads an hour block onto the grid, reusing it if it has already been read in this run.
+
+    Args:
+        filepath: Path to parquet file of block.
+        block_start: Start time of block.
+        block_cache: Blocks already read, updated in place.
+
+    Returns:
+        Column names, array of block data with shape (n_columns, n_samples), and native layout of
+        block (None if it's stored on the grid).
+    """
+    if filepath not in block_cache:
+        with stage('read_block') as counters:
+            columns, block = read_block(filepath)
+            native_layout = get_block_layout(pq.read_schema(filepath))
+            counters['rows'] += block.shape[1]
+            counters['bytes'] += block.nbytes
+        block_cache[filepath] = (block_start, columns, block, native_layout)
+    _, columns, block, native_layout = block_cache[filepath]
+    return columns, block, native_layout
+
+
+def label_sweep(
+    patient_id: str,
+    forecast_windows: Sequence[int] = (60 * 60,),
+    setbacks: Sequence[int] = (15 * 60,),
+    lead_gaps: Sequence[int] = (4 * 60 * 60,),
+):
+    """Generate labels csvs for every combination of labelling parameters.
+
+    Requires converted parquet dataset to be split, see `split`. For each combination, the samples
+    are the ones `label` would produce with the same parameters (the hour blocks of each split and
+    the augmented samples for the combination), labelled the same way. Augmented samples are only
+    listed, not created, so run `label` with the chosen parameters to create them. No parquet files
+    are read, so all combinations are computed quickly.
+
+    Saves a csv for each split and combination to `sweep/<pid>_<split>_labels_fw<forecast_window>_
+    sb<setback>_lg<lead_gap>.csv` in ARTIFACTS_PATH, along with `sweep/<pid>_summary.csv` counting
+    the samples and positive labels for each combination.
+
+    Args:
+        patient_id: patient id.
+        forecast_windows: sizes of forecast window in seconds.
+        setbacks: Times in between forecast window and sztime in seconds.
+        lead_gaps: Sizes of window where following seizures are dropped.
+    """
+    assert str(patient_id) in PATIENT_IDS, f"{patient_id} not in {PATIENT_IDS}"
+    assert is_split(patient_id), \
+        "Not all splits exist, run `eadata split <pid> <train_prop>,<test_prop>` first."
+
+    sweep_dir = ARTIFACTS_PATH / 'sweep'
+    sweep_dir.mkdir(exist_ok=True, parents=True)
+
+    # Files in each split ('<pid>/<session>/<file>'), same as in `label`
+    split_of_file, files_by_timestamp = _get_split_files(patient_id)
+    split_files = {
+        split_name: [
+            Path().joinpath(*fp.parts[-3:])
+            for fp in sorted(split_of_file, key=lambda fp: fp.stem)
+            if split_of_file[fp] == split_name
+        ]
+        for split_name in SPLIT_NAMES
+    }
+
+    summary = []
+    for lead_gap in lead_gaps:
+        sztimes = _load_lead_sztimes(patient_id, lead_gap)
+        for forecast_window, setback in itertools.product(forecast_windows, setbacks):
+            params = {'forecast_window': forecast_window, 'setback': setback, 'lead_gap': lead_gap}
+            suffix = f"fw{forecast_window}_sb{setback}_lg{lead_gap}"
+            positive_times = _get_positive_times(sztimes, forecast_window, setback)
+            for split_name in SPLIT_NAMES:
+                augment_windows = _get_augment_windows(
+                    positive_times,
+                    split_files[split_name],
+                    split_of_file,
+                    files_by_timestamp,
+                )
+                augmented_files = [
+                    Path().joinpath(
+                        *filepath.parts[-3:-1], f"{t.strftime(TIMESTAMP_FORMAT)}.parquet")
+                    for t, filepath, _ in augment_windows
+                ]
+                labels_df = pd.DataFrame(
+                    sorted(split_files[split_name] + augmented_files),
+                    columns=['filepath'],
+                )
+                labels_df['label'] = _get_labels(
+                    _get_file_times(labels_df.filepath),
+                    sztimes,
+                    forecast_window,
+                    setback,
+                )
+                labels_df.to_csv(
+                    sweep_dir / f'{patient_id}_{split_name}_labels_{suffix}.csv',
+                    index=False,
+                )
+                summary.append({
+                    'split': split_name,
+                    **params,
+                    'n_samples': len(labels_df),
+                    'n_positive': int(labels_df.label.sum()),
+                })
+
+    summary_path = sweep_dir / f'{patient_id}_summary.csv'
+    pd.DataFrame(summary).to_csv(summary_path, index=False)
+    logger.info(f"Saved labels for {len(summary) // len(SPLIT_NAMES)} combinations to {sweep_dir}")
+
+
+def _load_lead_sztimes(patient_id: str, lead_gap: int) -> pd.Series:
+    """Loads seizure times (UTC) and drops non-lead seizures."""
+    with open(str(SZTIMES_PATH / f'{patient_id}.pkl'), 'rb') as f:
+        sztimes = pickle.load(f)['utc']
+
+    # drop non-lead seizures
+    sztimes = sztimes[sztimes.diff().dt.total_seconds().fillna(1e6) > lead_gap]
+    sztimes = sztimes.reset_index(drop=True)
+    return sztimes
+
+
+def _get_file_times(filepaths: pd.Series) -> np.ndarray:
+    """Get start times of sample files from their names, as int64 UTC nanoseconds."""
+    stems = filepaths.astype(str).str.rsplit('/', n=1).str[-1].str.slice(stop=-len('.parquet'))
+    return pd.to_datetime(stems, format=TIMESTAMP_FORMAT, utc=True).values.astype(np.int64)
+
+
+def _get_labels(
+    file_times: np.ndarray,
+    sztimes: pd.Series,
+    forecast_window: int,
+    setback: int,
+) -> np.ndarray:
+    """Labels samples by whether they start in the forecast window of a seizure.
+
+    A sample starting at `t` is positive if a seizure (minute floored) occurs at `s` with
+    `0 <= s - forecast_window - t < setback` and `t` lies on the same minute grid as
+    `s - forecast_window - setback`, which is equivalent to `t` being one of the forecast times
+    generated in `label`. Seizure intervals all have the same length, so the interval ending
+    soonest after `t` is the only one that needs to be checked, which is found by binary search.
+
+    Args:
+        file_times: Start times of samples as int64 UTC nanoseconds.
+        sztimes: Seizure times (UTC).
+        forecast_window: size of forecast window in seconds.
+        setback: Time in between forecast window and sztime in seconds.
+
+    Returns:
+        Array of labels (0 or 1).
+    """
+    second = 10**9
+    ends = np.sort(sztimes.dt.floor('1min').values.astype(np.int64)) - forecast_window * second
+    starts = ends - setback * second
+
+    idx = np.searchsorted(ends, file_times, side='left')
+    in_range = idx < len(ends)
+    labels = np.zeros(len(file_times), dtype=bool)
+    labels[in_range] = starts[idx[in_range]] < file_times[in_range]
+    labels &= (file_times + (forecast_window + setback) * second) % (60 * second) == 0
+    return labels.astype(int)
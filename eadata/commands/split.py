@@ -0,0 +1,139 @@
+import json
+import os
+import shutil
+import logging
+from pathlib import Path
+from typing import Dict, List, Union
+
+import numpy as np
+
+from ..globals import PATIENT_IDS, SPLIT_NAMES
+from ..instrumentation import instrumented, stage
+from ..manifest import get_converted_sessions, get_entry_options, load_manifest
+from ..paths import PARQUET_PATH, get_split_manifest_path
+
+logger = logging.getLogger(__name__)
+
+
+@instrumented('split')
+def split(patient_id: str, proportions: List[Union[float, int]], in_place: bool = False):
+    """Create train/test split across sessions in parquet.
+
+    Requires converted data in parquet format, see `convert`.
+
+    Splits data in `./data/parquet/<pid>` by file size into `./data/parquet/<split>/<pid>`, where
+    `<split>` is either `train`, or `test`. Existing splits will be undone before creating new
+    split.
+
+    If `in_place`, sessions are left in `./data/parquet/<pid>` and their splits are recorded in
+    `artifacts/<pid>/split_manifest.json` instead (keyed by the session keys of `convert`), using
+    the session sizes recorded by `convert`.
+    `label`, `clean` and the readers resolve splits from the manifest, so re-splitting only writes
+    the manifest (sessions previously moved into split dirs are moved back once).
+
+    Sessions converted in the 'hive' layout can't be split, see `convert`.
+
+    Args:
+        patient_id: Patient ID.
+        proportions: Proportions of data to use for testing, remaining proportion for training.
+        in_place: Whether to record splits in a manifest rather than moving session dirs.
+    """
+    assert all(p > 0 for p in proportions), "Expected valid `proportions`."
+    assert len(proportions) == 2, "Expected 2 proportions for train/test split"
+    assert str(patient_id) in PATIENT_IDS, "Patient ID not found."
+    layouts = {get_entry_options(entry)['layout'] for entry in load_manifest(patient_id).values()}
+    assert 'hive' not in layouts, \
+        f"Sessions of {patient_id} were converted with `--layout hive`, which can't be split. " \
+        "Reconvert them with `--layout sessions` to split, label and clean them."
+
+    patient_path = PARQUET_PATH / str(patient_id)
+
+    # normalise proportions
+    train_prop, test_prop = [p / sum(proportions) for p in proportions]
+    logger.info(f"Creating train/test/val split of {train_prop} : {test_prop}")
+
+    # If sessions in PARQUET_DIR are already split, undo the split before proceeding
+    for split_name in SPLIT_NAMES:
+        split_path = PARQUET_PATH / split_name / str(patient_id)
+        if split_path.exists():
+            logger.info(f"Found {split_name} split for {patient_id =}, undoing before proceeding")
+            patient_path.mkdir(exist_ok=True, parents=True)
+            for session in split_path.iterdir():
+                shutil.move(str(session), str(patient_path))
+            shutil.rmtree(str(split_path))
+
+    split_manifest_path = get_split_manifest_path(patient_id)
+    if in_place:
+        sessions = get_converted_sessions(patient_id)
+        if len(sessions) == 0:
+            raise FileNotFoundError('Convert data to parquet before running')
+
+        # Sessions in order of session index (i.e. in time order)
+        session_keys = sorted(sessions, key=lambda key: sessions[key]['session_ind'])
+        splits = _split_sessions(
+            session_keys,
+            np.array([sessions[key]['output_bytes'] for key in session_keys], dtype=np.int64),
+            train_prop,
+        )
+        split_manifest = {
+            key: split_name for split_name, keys in zip(SPLIT_NAMES, splits) for key in keys
+        }
+        for split_name, keys in zip(SPLIT_NAMES, splits):
+            logger.info(f"Creating {split_name} split")
+            if len(keys) == 0:
+                logger.warning(f"No sessions in {split_name} split.")
+
+        with stage('write_split_manifest') as counters:
+            _save_split_manifest(split_manifest, split_manifest_path)
+            counters['rows'] += len(split_manifest)
+        return
+
+    split_manifest_path.unlink(missing_ok=True)
+    if not patient_path.exists() or not any(patient_path.iterdir()):
+        raise FileNotFoundError('Convert data to parquet before running')
+
+    # Get all session dirs in PARQUET_DIR
+    session_dirs = sorted(list(p for p in patient_path.glob('**/*') if not p.is_file()))
+
+    # Get cumulative sums of session sizes
+    dir_size = lambda d: np.sum(np.fromiter((f.stat().st_size for f in d.glob('*')), np.int64))
+    session_sizes = np.fromiter((dir_size(d) for d in session_dirs), np.int64)
+
+    # Split session_dirs into splits of given proportions
+    splits = _split_sessions(session_dirs, session_sizes, train_prop)
+
+    # Move sessions to their splits
+    sizes = dict(zip(session_dirs, session_sizes))
+    for split_name, session_dirs in zip(SPLIT_NAMES, splits):
+        split_path = PARQUET_PATH / split_name / str(patient_id)
+        split_path.mkdir(exist_ok=True, parents=True)
+        logger.info(f"Creating {split_name} split")
+
+        if len(session_dirs) == 0:
+            logger.warning(f"No sessions in {split_name} split.")
+            continue
+
+        with stage('move_sessions') as counters:
+            for session in session_dirs:
+                shutil.move(str(session), str(split_path))
+            counters['rows'] += len(session_dirs)
+            counters['bytes'] += int(sum(sizes[session] for session in session_dirs))
+
+    # Remove empty directories
+    if not any(patient_path.iterdir()):
+        patient_path.rmdir()
+
+
+def _split_sessions(sessions: list, session_sizes: np.ndarray, train_prop: float) -> List[list]:
+    """Splits sessions (in order) into train and test splits by their cumulative size."""
+    c_props = np.cumsum(session_sizes) / np.sum(session_sizes)
+    split_idx = np.where(c_props <= train_prop)[0][-1]
+    return [sessions[:split_idx], sessions[split_idx:]]
+
+
+def _save_split_manifest(split_manifest: Dict[str, str], manifest_path: Path) -> None:
+    manifest_path.parent.mkdir(exist_ok=True, parents=True)
+    tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    with open(str(tmp_path), 'w') as f:
+        json.dump(split_manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
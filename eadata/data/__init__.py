@@ -1,2 +1,15 @@
-from .save_session_to_parquet import save_session_to_parquet
-from .get_session_dataframe import get_session_dataframe
+from .save_session_to_parquet import (
+    save_session_to_parquet,
+    write_table_atomic,
+    PARQUET_PROFILES,
+    LAYOUTS,
+)
+from .get_session_dataframe import get_session_dataframe, get_edf_reader, EDF_BACKENDS
+from .stream_session_to_parquet import stream_session_to_parquet
+from .read_edf import read_edf, read_edf_header, EDFFile
+from .session_buffer import SessionBuffer
+from .read_sample import read_sample, read_window, load_augmented_samples
+from .read import read
+from .time_axis import TimeAxis, to_ns
+from .write_dataset_metadata import write_dataset_metadata
+from .native_blocks import read_block, STORAGE_MODES
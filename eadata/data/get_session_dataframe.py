@@ -1,138 +1,128 @@
+import math
 import warnings
 from pathlib import Path
-from pytz import timezone, utc
-from typing import Optional, Dict
+from typing import Any, Callable, Optional, Dict
 
 import pandas as pd
 import numpy as np
-import mne
 
-from eadata.globals import DTYPES, SRATE
+from eadata.globals import CHANNEL_NAMES, DTYPES, SRATE
+from eadata.instrumentation import stage, staged
+from .read_edf import read_edf
+from .session_buffer import SessionBuffer, get_session_layout
 
-mne.set_log_level(False)
+EDF_BACKENDS = ['native', 'mne']
 
 
+@staged('get_session_dataframe')
 def get_session_dataframe(
     session_dir: Path,
     inner_join: bool = False,
     pad: bool = True,
+    backend: str = 'native',
 ) -> Optional[pd.DataFrame]:
     """Converts a session directory into a pandas dataframe.
 
+    Each channel group is placed on the `SRATE` grid at the integer sample offset of its start time
+    and scattered into one preallocated buffer with slicing, so no timestamps are joined.
+
     Args:
         session_dir: Path to session directory.
+        inner_join: Whether to only keep samples where all channel groups are present (NaN-ed out
+            if `pad`, otherwise dropped).
+        pad: Whether to pad the session with NaNs to the start and end of UTC hours, otherwise the
+            grid runs from the first to the last sample of any channel group.
+        backend: EDF reader to use, either 'native' (see `read_edf`) or 'mne'.
 
     Returns:
-        Dataframe with columns corresponding to data types (in order of DTYPES). If all the channel
-        groups are bad, returns None.
+        Dataframe with columns corresponding to data types (in order of DTYPES) and UTC time index.
+        If all the channel groups are bad, returns None.
     """
-    files = load_session_data(session_dir)
+    files = load_session_data(session_dir, backend=backend)
     if all(f is None for f in files.values()):
         return None
 
-    file_dfs = (_get_channel_group_dataframe(files[dtype], dtype) for dtype in DTYPES)
-    df = pd.concat(file_dfs, axis=1, join=('inner' if inner_join else 'outer'))
-
-    if pad:
-        df = _pad_session_df(df)
-
-    return df
-
-
-def _pad_session_df(df: pd.DataFrame) -> pd.DataFrame:
-    """Pads start and end of dataframe with NaNs up to start of UTC minute and end of UTC minute.
-
-    Args:
-        df: session dataframe.
-
-    Returns:
-        Padded dataframe.
-    """
-    df_start = df.index[0]
-    block_start = df_start.floor('H')
-    if block_start != df_start:
-        start_pad_index = pd.to_timedelta(
-            np.arange((df_start - block_start).total_seconds(), 0, -1 / 128), 's')
-        start_pad = pd.DataFrame(np.nan, index=df_start - start_pad_index, columns=df.columns)
-        df = pd.concat([start_pad, df], axis=0)
-
-    df_end = df.index[-1]
-    block_end = df_end.ceil('H')
-    if block_end != df_end:
-        end_pad_index = pd.to_timedelta(
-            np.arange(1 / 128, (block_end - df_end).total_seconds(), 1 / 128), 's')
-        end_pad = pd.DataFrame(np.nan, index=df_end + end_pad_index, columns=df.columns)
-        df = pd.concat([df, end_pad], axis=0)
-
-    assert (block_end - block_start).total_seconds() * SRATE == len(df), \
-        "FATAL :Incorrect padding or join operation occured."
-    return df
-
-
-def _get_index_from_file(file: mne.io.edf.edf.RawEDF) -> pd.DatetimeIndex:
-    """Get time index from file. First loads as US/Central time, then converted to UTC.
-
-    Args:
-        file: MNE RawEDF file.
+    buffer = _get_session_buffer(files, pad)
+    if not inner_join:
+        return buffer.to_dataframe()
 
-    Returns:
-        pandas DatatimeIndex generated from file start (UTC) and times vector from file.
-    """
-    tz = timezone('US/Central')
-    start = file.info['meas_date'].replace(tzinfo=tz)
-    start = start.astimezone(utc)
-    index = pd.to_datetime(start) + pd.to_timedelta(file.times, 's')
-    return index
+    with stage('inner_join') as counters:
+        if len(files) > sum(f is not None for f in files.values()):
+            buffer.data[:] = np.nan
+        buffer.mask_incomplete()
+        counters['rows'] += buffer.n_samples
+    df = buffer.to_dataframe()
+    return df if pad else df[~np.isnan(buffer.data[0])]
 
 
-def _get_channel_group_dataframe(
-    file: mne.io.edf.edf.RawEDF,
-    dtype: str,
-) -> pd.DataFrame:
-    """Converts file into dataframe.
+def _get_session_buffer(
+    files: Dict[str, Optional[Any]],
+    pad: bool = True,
+) -> SessionBuffer:
+    """Places session on the SRATE grid, optionally padded with NaNs to the start and end of hours.
 
     Args:
-        file: MNE RawEDF file.
+        files: Dictionary of DTYPE files, see `load_session_data`.
+        pad: Whether to pad the session to whole UTC hours.
 
     Returns:
-        Dataframe with columns corresponding to channels in file and UTC time index.
+        Buffer of session.
     """
-    column_names = {
-        'ACC': ['acc_x', 'acc_y', 'acc_z', 'acc_mag'],
-        'BVP': ['bvp'],
-        'EDA': ['eda'],
-        'HR': ['hr'],
-        'TEMP': ['temp'],
-    }
-    if file is None:
-        file_df = pd.DataFrame(columns=column_names[dtype])
-    else:
-        file_df = pd.DataFrame(
-            data=np.array(file.get_data().transpose(), dtype=np.float32),
-            index=_get_index_from_file(file),
-            columns=column_names[dtype],
-        )
-    return file_df
-
-
-def load_session_data(session_dir: Path) -> Dict[str, Optional[mne.io.edf.edf.RawEDF]]:
+    block_len = 60 * 60 * SRATE
+    grid, offsets = get_session_layout(files)
+
+    first = 0 if pad else min(offsets.values())
+    n_samples = math.ceil(len(grid) / block_len) * block_len if pad else len(grid) - first
+    with stage('read_edf') as counters:
+        buffer = SessionBuffer(grid.window(first, n_samples))
+        for dtype, offset in offsets.items():
+            buffer.write_file(files[dtype], CHANNEL_NAMES[dtype], offset - first)
+        counters['rows'] += buffer.n_samples
+        counters['bytes'] += buffer.data.nbytes
+    return buffer
+
+
+@staged('load_session_data')
+def load_session_data(session_dir: Path, backend: str = 'native') -> Dict[str, Optional[Any]]:
     """Loads each DTYPE edf file located in a session dir.
 
     Args:
         session_dir: Path to session directory.
+        backend: EDF reader to use, either 'native' (see `read_edf`) or 'mne'.
 
     Returns:
-        Dictionary of DTYPE files. If an error occurs during loading an EDF file, `None` is stored
-        as the value.
+        Dictionary of DTYPE files (`EDFFile` or MNE `RawEDF` depending on `backend`). If an error
+        occurs during loading an EDF file, `None` is stored as the value.
     """
+    read_file = get_edf_reader(backend)
     files = {}
     with warnings.catch_warnings():
         warnings.simplefilter('error')
         for dtype in DTYPES:
             fp = session_dir / f"Empatica-{dtype}.edf"
             try:
-                files[dtype] = mne.io.read_raw_edf(fp)
+                files[dtype] = read_file(fp)
             except:
                 files[dtype] = None
 
     return files
+
+
+def get_edf_reader(backend: str) -> Callable[[Path], Any]:
+    """Get function for opening EDF files with the given backend.
+
+    MNE is only imported when requested, as importing it is slow.
+
+    Args:
+        backend: Either 'native' or 'mne'.
+
+    Returns:
+        Function mapping a filepath to an opened EDF file.
+    """
+    assert backend in EDF_BACKENDS, f"{backend} not in {EDF_BACKENDS}"
+    if backend == 'native':
+        return read_edf
+
+    import mne
+    mne.set_log_level(False)
+    return mne.io.read_raw_edf
@@ -0,0 +1,197 @@
+"""Hour blocks stored at the native sample rate of each channel group.
+
+In 'grid' storage every channel is stored on the `SRATE` grid, so low rate channel groups (EDA,
+TEMP, HR) are mostly NaN. In 'native' storage each row of an hour block holds one second, and each
+channel is a fixed size list of the samples it has in that second (e.g. 4 values for EDA). The
+position of each channel group on the grid is recorded in the schema metadata as a `step` (grid
+samples between native samples) and `phase` (grid position of the first native sample), so blocks
+can be placed back on the grid exactly when read (see `read_block`).
+"""
+import json
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from eadata.globals import CHANNEL_NAMES, DTYPE_SRATES, DTYPES, SRATE
+
+STORAGE_MODES = ['grid', 'native']
+FILL_METHODS = ['hold', 'linear']
+NATIVE_LAYOUT_KEY = b'eadata.native_layout'
+
+DTYPE_OF_COLUMN = {col: dtype for dtype in DTYPES for col in CHANNEL_NAMES[dtype]}
+
+
+def get_native_layout(
+    files: Dict[str, Optional[Any]],
+    offsets: Dict[str, int],
+) -> Dict[str, Dict[str, int]]:
+    """Get the native sample rate of each channel group of a session and its position on the grid.
+
+    Channel groups whose rate doesn't divide `SRATE` are kept on the grid (step of 1). Missing
+    channel groups are given the nominal rate in DTYPE_SRATES.
+
+    Args:
+        files: Dictionary of DTYPE files, see `load_session_data`.
+        offsets: Grid offset of each valid file, see `get_session_layout`.
+
+    Returns:
+        Dictionary mapping DTYPE to `sfreq`, `step` and `phase` (grid position of the first native
+        sample in any block, which is the same for every block of the session).
+    """
+    layout = {}
+    for dtype in DTYPES:
+        sfreq = DTYPE_SRATES[dtype] if files.get(dtype) is None else files[dtype].info['sfreq']
+        step = SRATE / sfreq
+        step = int(step) if step == int(step) else 1
+        layout[dtype] = {
+            'sfreq': SRATE // step,
+            'step': step,
+            'phase': offsets.get(dtype, 0) % step,
+        }
+    return layout
+
+
+def to_native_table(data: np.ndarray, columns: List[str], layout: Dict[str, Dict]) -> pa.Table:
+    """Converts a block on the grid to a table in native storage.
+
+    Args:
+        data: Block data with shape (len(columns), n_samples), where n_samples is a whole number of
+            seconds.
+        columns: Column names of rows of `data`.
+        layout: Native layout of session, see `get_native_layout`.
+
+    Returns:
+        Table with a row for each second and a fixed size list column for each channel.
+    """
+    n_samples = data.shape[1]
+    assert n_samples % SRATE == 0, "Expected block of whole seconds."
+
+    arrays = []
+    for i, col in enumerate(columns):
+        group = layout[DTYPE_OF_COLUMN[col]]
+        values = np.ascontiguousarray(data[i, group['phase']::group['step']])
+        arrays.append(pa.FixedSizeListArray.from_arrays(pa.array(values), group['sfreq']))
+
+    schema = pa.schema(
+        [pa.field(col, arr.type) for col, arr in zip(columns, arrays)],
+        metadata={NATIVE_LAYOUT_KEY: json.dumps(layout)},
+    )
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def get_block_layout(schema: pa.Schema) -> Optional[Dict[str, Dict]]:
+    """Native layout of a block from its schema, or None if the block is stored on the grid."""
+    metadata = schema.metadata or {}
+    if NATIVE_LAYOUT_KEY not in metadata:
+        return None
+    return json.loads(metadata[NATIVE_LAYOUT_KEY])
+
+
+def get_block_length(pq_path: Path) -> int:
+    """Number of grid samples in an hour block, in either storage mode."""
+    pq_file = pq.ParquetFile(pq_path)
+    samples_per_row = 1 if get_block_layout(pq_file.schema_arrow) is None else SRATE
+    return pq_file.metadata.num_rows * samples_per_row
+
+
+def read_block(
+    pq_path: Path,
+    columns: Optional[List[str]] = None,
+    start: int = 0,
+    stop: Optional[int] = None,
+    fill: Optional[str] = None,
+) -> Tuple[List[str], np.ndarray]:
+    """Reads a range of samples of an hour block on the grid, in either storage mode.
+
+    Only the row groups overlapping the range are read.
+
+    Args:
+        pq_path: Path to hour block.
+        columns: Columns to read (defaults to all columns).
+        start: Grid position of first sample to read.
+        stop: Grid position after last sample to read (defaults to end of block).
+        fill: How to fill the grid between the native samples of low rate channels (see
+            `fill_native_gaps`), or None to leave them as NaN.
+
+    Returns:
+        Column names, and array of block data with shape (len(columns), stop - start).
+    """
+    pq_file = pq.ParquetFile(pq_path)
+    layout = get_block_layout(pq_file.schema_arrow)
+    columns = list(pq_file.schema_arrow.names if columns is None else columns)
+    samples_per_row = 1 if layout is None else SRATE
+
+    n_samples = pq_file.metadata.num_rows * samples_per_row
+    stop = n_samples if stop is None else min(stop, n_samples)
+    start = min(max(0, start), stop)
+    row_start, row_stop = start // samples_per_row, math.ceil(stop / samples_per_row)
+
+    row_groups, group_start, first_row = [], 0, None
+    for i in range(pq_file.metadata.num_row_groups):
+        n_rows = pq_file.metadata.row_group(i).num_rows
+        if group_start < row_stop and group_start + n_rows > row_start:
+            row_groups.append(i)
+            first_row = group_start if first_row is None else first_row
+        group_start += n_rows
+
+    data = np.full((len(columns), (row_stop - row_start) * samples_per_row), np.nan, np.float32)
+    if len(row_groups) > 0:
+        table = pq_file.read_row_groups(row_groups, columns=columns)
+        table = table.slice(row_start - first_row, row_stop - row_start)
+        for i, col in enumerate(columns):
+            values = table.column(col).combine_chunks()
+            if layout is None:
+                data[i] = values.to_numpy(zero_copy_only=False)
+            else:
+                group = layout[DTYPE_OF_COLUMN[col]]
+                values = values.flatten().to_numpy(zero_copy_only=False)
+                data[i, group['phase']::group['step']] = values
+
+    offset = start - row_start * samples_per_row
+    data = data[:, offset:offset + stop - start]
+    if fill is not None:
+        # Grid blocks don't record their rates, so the nominal rates are assumed
+        groups = layout or {
+            dtype: {'step': SRATE // sfreq} for dtype, sfreq in DTYPE_SRATES.items()
+        }
+        for i, col in enumerate(columns):
+            data[i] = fill_native_gaps(data[i], groups[DTYPE_OF_COLUMN[col]]['step'], fill)
+    return columns, data
+
+
+def fill_native_gaps(row: np.ndarray, step: int, method: str = 'hold') -> np.ndarray:
+    """Resamples a channel to the grid by filling between its native samples.
+
+    Only runs of fewer than `step` missing samples after a native sample are filled, so gaps in
+    the recording stay NaN.
+
+    Args:
+        row: Channel data on the grid.
+        step: Grid samples between native samples of the channel.
+        method: Either 'hold' (repeat the last native sample) or 'linear' (interpolate between
+            native samples).
+
+    Returns:
+        Filled channel data.
+    """
+    assert method in FILL_METHODS, f"{method} not in {FILL_METHODS}"
+    if step <= 1:
+        return row
+
+    positions = np.arange(len(row))
+    valid = ~np.isnan(row)
+    prev = np.maximum.accumulate(np.where(valid, positions, -1))
+    fill_mask = ~valid & (prev >= 0) & (positions - prev < step)
+
+    filled = row.copy()
+    if method == 'hold':
+        filled[fill_mask] = row[prev[fill_mask]]
+    else:
+        nxt = np.minimum.accumulate(np.where(valid, positions, len(row))[::-1])[::-1]
+        fill_mask &= (nxt < len(row)) & (nxt - prev <= step)
+        filled[fill_mask] = np.interp(positions[fill_mask], positions[valid], row[valid])
+    return filled
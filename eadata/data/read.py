@@ -0,0 +1,96 @@
+"""Query converted data by time range, independent of how it's split into hour blocks."""
+import math
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from eadata.globals import SPLIT_NAMES, SRATE, TIMESTAMP_FORMAT
+from eadata.paths import PARQUET_PATH
+from .native_blocks import read_block
+from .session_buffer import COLUMNS, SessionBuffer
+from .time_axis import TimeAxis
+
+BLOCK_SECONDS = 60 * 60
+
+
+def read(
+    patient_id: str,
+    start: Union[str, datetime, pd.Timestamp],
+    end: Union[str, datetime, pd.Timestamp],
+    columns: Optional[List[str]] = None,
+    as_frame: bool = True,
+    index: bool = True,
+    fill: Optional[str] = None,
+) -> Union[pd.DataFrame, np.ndarray]:
+    """Reads converted data of a patient between two times.
+
+    Finds the hour blocks covering `[start, end)` in any split (or unsplit data), and reads only the
+    requested columns of the row groups overlapping the range. Positions are computed as integer
+    sample offsets from the block timestamps, so the result is aligned to the `SRATE` grid (whatever
+    the storage mode of the blocks) and samples not covered by any block are NaN. If sessions
+    overlap, the first session found is used.
+
+    Args:
+        patient_id: Patient ID.
+        start: Start of range (UTC if no timezone is given), rounded down to the grid.
+        end: End of range (exclusive), rounded up to the grid.
+        columns: Columns to read (defaults to all columns).
+        as_frame: Whether to return a dataframe, otherwise an array with shape
+            (len(columns), n_samples).
+        index: Whether the dataframe has a UTC DatetimeIndex.
+        fill: How to resample low rate channels to the grid, either 'hold' or 'linear' (see
+            `native_blocks.fill_native_gaps`), or None to leave NaN between native samples.
+
+    Returns:
+        Data in range, with a column (or row) for each of `columns`.
+    """
+    columns = list(COLUMNS if columns is None else columns)
+    assert all(col in COLUMNS for col in columns), f"Expected columns in {COLUMNS}"
+
+    # Absolute sample numbers on the grid (the epoch falls on the grid)
+    grid = TimeAxis(0, SRATE, 0)
+    sample_start = grid.index(start, 'floor')
+    sample_end = grid.index(end, 'ceil')
+    assert sample_end > sample_start, "Expected `end` to be after `start`."
+
+    buffer = SessionBuffer(grid.window(sample_start, sample_end - sample_start), columns)
+    block_len = BLOCK_SECONDS * SRATE
+    session_dirs = get_patient_session_dirs(patient_id)
+    for i_block in range(sample_start // block_len, math.ceil(sample_end / block_len)):
+        block_start = grid.window(i_block * block_len, block_len).start
+        name = block_start.strftime(f'{TIMESTAMP_FORMAT}.parquet')
+        pq_path = next((d / name for d in session_dirs if (d / name).exists()), None)
+        if pq_path is None:
+            continue
+
+        offset = i_block * block_len - sample_start
+        _, data = read_block(
+            pq_path,
+            columns,
+            start=max(0, -offset),
+            stop=buffer.n_samples - offset,
+            fill=fill,
+        )
+        buffer.write(columns, data, max(0, offset))
+
+    if not as_frame:
+        return buffer.data
+    return buffer.to_dataframe(index=index)
+
+
+def get_patient_session_dirs(patient_id: str) -> List[Path]:
+    """Get converted session dirs of a patient, whether or not they've been split.
+
+    Args:
+        patient_id: Patient ID.
+
+    Returns:
+        Paths of session dirs in `parquet/<split>/<pid>` and `parquet/<pid>`.
+    """
+    patient_dirs = [Path(PARQUET_PATH) / split / str(patient_id) for split in SPLIT_NAMES]
+    patient_dirs.append(Path(PARQUET_PATH) / str(patient_id))
+    return [d for patient_dir in patient_dirs if patient_dir.exists()
+            for d in sorted(patient_dir.iterdir()) if d.is_dir()]
@@ -0,0 +1,251 @@
+"""Native reader for EDF files.
+
+Parses the EDF header directly and memory-maps the data records, so that channel data can be read
+as scaled float32 (or raw int16) arrays without going through MNE.
+"""
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+
+HEADER_NBYTES = 256
+SIGNAL_HEADER_NBYTES = 256
+ANNOTATION_LABEL = 'EDF Annotations'
+
+# Units that MNE rescales to volts, mapped to their scale factor
+UNIT_SCALES = {'uV': 1e-6, 'μV': 1e-6, 'µV': 1e-6, 'mV': 1e-3}
+
+# (name, width in bytes) of each field in the signal header block, in the order they're stored
+SIGNAL_HEADER_FIELDS = [
+    ('label', 16),
+    ('transducer', 80),
+    ('physical_dim', 8),
+    ('physical_min', 8),
+    ('physical_max', 8),
+    ('digital_min', 8),
+    ('digital_max', 8),
+    ('prefilter', 80),
+    ('n_samples', 8),
+    ('reserved', 32),
+]
+
+
+def read_edf_header(fp: Union[str, Path]) -> Dict[str, Any]:
+    """Reads and validates the header of an EDF file.
+
+    Args:
+        fp: Path to EDF file.
+
+    Returns:
+        Dictionary of header fields. Signal fields are lists with one entry per signal, and
+        annotation signals are kept (see `signals` for the indices of data signals).
+
+    Raises:
+        ValueError: If the header is malformed (including an unparseable start date or time) or
+            inconsistent with the size of the file.
+    """
+    fp = Path(fp)
+    with open(fp, 'rb') as f:
+        main_header = f.read(HEADER_NBYTES)
+        if len(main_header) != HEADER_NBYTES:
+            raise ValueError(f"Truncated EDF header in {fp}")
+
+        n_signals = _parse_int(main_header[252:256])
+        signal_header = f.read(n_signals * SIGNAL_HEADER_NBYTES)
+        if len(signal_header) != n_signals * SIGNAL_HEADER_NBYTES:
+            raise ValueError(f"Truncated EDF signal header in {fp}")
+
+    header = {
+        'meas_date': _parse_meas_date(main_header, fp),
+        'header_nbytes': _parse_int(main_header[184:192]),
+        'n_records': _parse_int(main_header[236:244]),
+        'record_duration': float(_decode(main_header[244:252])),
+        'n_signals': n_signals,
+    }
+
+    # Signal header fields are stored field by field, each field repeated for every signal
+    pos = 0
+    for name, width in SIGNAL_HEADER_FIELDS:
+        values = []
+        for _ in range(n_signals):
+            values.append(_decode(signal_header[pos:pos + width]))
+            pos += width
+        header[name] = values
+
+    for name in ['physical_min', 'physical_max', 'digital_min', 'digital_max']:
+        header[name] = [float(v) for v in header[name]]
+    header['n_samples'] = [int(v) for v in header['n_samples']]
+
+    if header['header_nbytes'] != HEADER_NBYTES + n_signals * SIGNAL_HEADER_NBYTES:
+        raise ValueError(f"Header size in {fp} does not match number of signals")
+    if header['record_duration'] <= 0:
+        raise ValueError(f"Invalid record duration in {fp}")
+
+    header['signals'] = [i for i, label in enumerate(header['label']) if label != ANNOTATION_LABEL]
+    header['sfreq'] = [n / header['record_duration'] for n in header['n_samples']]
+    for i in header['signals']:
+        if header['digital_max'][i] == header['digital_min'][i]:
+            raise ValueError(f"Invalid digital range for signal {i} in {fp}")
+
+    # Check number of data records against size of file
+    record_nbytes = 2 * sum(header['n_samples'])
+    data_nbytes = fp.stat().st_size - header['header_nbytes']
+    if header['n_records'] == -1:
+        header['n_records'] = data_nbytes // record_nbytes
+    if record_nbytes == 0 or header['n_records'] * record_nbytes != data_nbytes:
+        raise ValueError(f"Number of records in {fp} does not match the file size")
+
+    return header
+
+
+class EDFFile:
+    """Memory-mapped EDF file.
+
+    Mirrors the parts of `mne.io.edf.edf.RawEDF` used in this package (`info['meas_date']`,
+    `info['sfreq']`, `ch_names`, `n_times`, `times` and `get_data`), so it can be used as a drop-in
+    backend.
+
+    Args:
+        fp: Path to EDF file.
+    """
+
+    def __init__(self, fp: Union[str, Path]):
+        self.filepath = Path(fp)
+        self.header = read_edf_header(self.filepath)
+        self._signals = self.header['signals']
+
+        sfreqs = {self.header['sfreq'][i] for i in self._signals}
+        if len(sfreqs) != 1:
+            raise ValueError(f"Expected one sample rate for all signals in {fp}, got {sfreqs}")
+
+        self.ch_names = [self.header['label'][i] for i in self._signals]
+        self.info = {
+            'meas_date': self.header['meas_date'],
+            'sfreq': sfreqs.pop(),
+            'ch_names': self.ch_names,
+        }
+
+        self._n_samples = self.header['n_samples']
+        self._sample_starts = np.cumsum([0] + self._n_samples)
+        self.n_times = self.header['n_records'] * self._n_samples[self._signals[0]]
+
+        # Calibration to physical units, following the same conventions as MNE
+        phys_min, phys_max, dig_min, dig_max = (
+            np.array([self.header[k][i] for i in self._signals])
+            for k in ['physical_min', 'physical_max', 'digital_min', 'digital_max']
+        )
+        units = np.array(
+            [UNIT_SCALES.get(self.header['physical_dim'][i], 1.0) for i in self._signals])
+        self._gain = (phys_max - phys_min) / (dig_max - dig_min) * units
+        self._offset = (phys_min - dig_min * (phys_max - phys_min) / (dig_max - dig_min)) * units
+
+        self._records = None
+
+    @property
+    def records(self) -> np.memmap:
+        """Memory map of the data records with shape (n_records, samples per record)."""
+        if self._records is None:
+            self._records = np.memmap(
+                self.filepath,
+                dtype='<i2',
+                mode='r',
+                offset=self.header['header_nbytes'],
+                shape=(self.header['n_records'], int(self._sample_starts[-1])),
+            )
+        return self._records
+
+    @property
+    def times(self) -> np.ndarray:
+        """Sample times in seconds relative to the start of the file."""
+        return np.arange(self.n_times) / self.info['sfreq']
+
+    def get_raw(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Reads unscaled digital values.
+
+        Only the data records overlapping `[start, stop)` are read from disk.
+
+        Args:
+            start: First sample to read.
+            stop: Sample to stop reading at (exclusive). Defaults to the end of the file.
+
+        Returns:
+            int16 array with shape (n_channels, stop - start).
+        """
+        stop = self.n_times if stop is None else min(stop, self.n_times)
+        start = min(max(start, 0), stop)
+        spr = self._n_samples[self._signals[0]]
+        rec_start, rec_stop = start // spr, -(-stop // spr)
+        trim = start - rec_start * spr
+
+        records = self.records[rec_start:rec_stop]
+        data = np.empty((len(self._signals), stop - start), dtype=np.int16)
+        for ch, i in enumerate(self._signals):
+            samples = records[:, self._sample_starts[i]:self._sample_starts[i + 1]].reshape(-1)
+            data[ch] = samples[trim:trim + stop - start]
+        return data
+
+    def get_data(
+        self,
+        start: int = 0,
+        stop: Optional[int] = None,
+        dtype: np.dtype = np.float32,
+    ) -> np.ndarray:
+        """Reads data scaled to physical units.
+
+        Args:
+            start: First sample to read.
+            stop: Sample to stop reading at (exclusive). Defaults to the end of the file.
+            dtype: Floating point type of the output.
+
+        Returns:
+            Array with shape (n_channels, stop - start).
+        """
+        data = self.get_raw(start, stop).astype(dtype)
+        data *= self._gain[:, None].astype(dtype)
+        data += self._offset[:, None].astype(dtype)
+        return data
+
+
+def read_edf(fp: Union[str, Path]) -> EDFFile:
+    """Opens an EDF file with the native reader.
+
+    Args:
+        fp: Path to EDF file.
+
+    Returns:
+        Memory-mapped EDF file.
+    """
+    return EDFFile(fp)
+
+
+def _decode(field: bytes) -> str:
+    return field.decode('latin-1').strip()
+
+
+def _parse_int(field: bytes) -> int:
+    return int(_decode(field))
+
+
+def _parse_meas_date(main_header: bytes, fp: Path) -> datetime:
+    """Parses start date and time from the main header as a UTC datetime (same as MNE)."""
+    # EDF+ files may store a 4 digit year in the recording field
+    date = None
+    recording = _decode(main_header[88:168]).split(' ')
+    if len(recording) == 5:
+        try:
+            date = datetime.strptime(recording[1], '%d-%b-%Y')
+        except ValueError:
+            date = None
+    if date is None:
+        try:
+            day, month, year = (int(x) for x in _decode(main_header[168:176]).split('.'))
+            date = datetime(year + 2000 if year < 85 else year + 1900, month, day)
+        except ValueError:
+            raise ValueError(f"Invalid start date in {fp}") from None
+
+    try:
+        hour, minute, second = (int(x) for x in _decode(main_header[176:184]).split('.'))
+        return date.replace(hour=hour, minute=minute, second=second, tzinfo=timezone.utc)
+    except ValueError:
+        raise ValueError(f"Invalid start time in {fp}") from None
@@ -0,0 +1,106 @@
+"""Functions for reading samples listed in labels csvs, including virtual augmented samples."""
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from eadata.globals import SRATE, TIMESTAMP_FORMAT
+from eadata.paths import ARTIFACTS_PATH, PARQUET_PATH, get_split_path
+from .native_blocks import get_block_length, read_block
+
+AUGMENTED_SAMPLES_COLUMNS = ['filepath', 'session', 'start', 'source', 'sample_offset', 'length']
+
+
+def get_augmented_samples_path(patient_id: str, split_name: str) -> Path:
+    return Path(ARTIFACTS_PATH) / f'{patient_id}_{split_name}_augmented.csv'
+
+
+def load_augmented_samples(patient_id: str, split_name: str) -> pd.DataFrame:
+    """Loads manifest of virtual augmented samples for a split, see `label(virtual=True)`.
+
+    Each row describes a window which starts `sample_offset` samples into the hour block `source`
+    (path relative to PARQUET_PATH) and continues into the following hour block(s) of the same
+    session for `length` samples.
+
+    Args:
+        patient_id: Patient ID.
+        split_name: Name of split.
+
+    Returns:
+        Dataframe with columns AUGMENTED_SAMPLES_COLUMNS, indexed by filepath. Empty if there are no
+        virtual samples.
+    """
+    manifest_path = get_augmented_samples_path(patient_id, split_name)
+    if not manifest_path.exists():
+        df = pd.DataFrame(columns=AUGMENTED_SAMPLES_COLUMNS)
+    else:
+        df = pd.read_csv(manifest_path)
+    return df.set_index('filepath', drop=False)
+
+
+def read_sample(
+    filepath: Union[str, Path],
+    split_name: str,
+    augmented_samples: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """Reads a sample listed in a labels csv.
+
+    Samples written to disk are read directly (and placed on the grid if they're in native storage).
+    Virtual augmented samples are built on demand from the hour blocks they were taken from.
+
+    Args:
+        filepath: Filepath as recorded in the labels csv (`<pid>/<session>/<file>`).
+        split_name: Name of split the sample belongs to.
+        augmented_samples: Manifest of virtual samples (see `load_augmented_samples`), loaded if
+            not given.
+
+    Returns:
+        Dataframe of sample with a column for each channel.
+    """
+    filepath = Path(filepath)
+    pq_path = get_split_path(filepath.parts[0], split_name) / filepath
+    if pq_path.exists():
+        columns, data = read_block(pq_path)
+        return pd.DataFrame(data.transpose(), columns=columns)
+
+    if augmented_samples is None:
+        augmented_samples = load_augmented_samples(filepath.parts[0], split_name)
+    if str(filepath) not in augmented_samples.index:
+        raise FileNotFoundError(f"{filepath} is neither a parquet file nor a virtual sample.")
+
+    row = augmented_samples.loc[str(filepath)]
+    return read_window(
+        Path(PARQUET_PATH) / row['source'],
+        int(row['sample_offset']),
+        int(row['length']),
+    )
+
+
+def read_window(source: Path, sample_offset: int, length: int) -> pd.DataFrame:
+    """Reads a window of samples spanning consecutive hour blocks of a session.
+
+    Args:
+        source: Path to hour block the window starts in.
+        sample_offset: Position of first sample of window in `source`.
+        length: Number of samples in window.
+
+    Returns:
+        Dataframe of window with a column for each channel.
+    """
+    block_start = pd.to_datetime(source.stem, format=TIMESTAMP_FORMAT)
+    chunks, n_read, pq_path = [], 0, source
+    while n_read < length:
+        block_len = get_block_length(pq_path)
+        stop = sample_offset + length - n_read
+        columns, chunk = read_block(pq_path, start=sample_offset, stop=stop)
+        chunks.append(chunk)
+        n_read += chunk.shape[1]
+        sample_offset = max(0, sample_offset - block_len)
+
+        block_start += pd.Timedelta(seconds=block_len / SRATE)
+        pq_path = source.parent / f"{block_start.strftime(TIMESTAMP_FORMAT)}.parquet"
+        if n_read < length and not pq_path.exists():
+            raise FileNotFoundError(f"Window from {source} runs past the end of the session.")
+
+    return pd.DataFrame(np.concatenate(chunks, axis=1).transpose(), columns=columns)
@@ -1,19 +1,70 @@
 """Functions for saving parquet files."""
+import inspect
+import logging
+import os
 from pathlib import Path
+from typing import Any, Dict, List
 
 import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 
-from eadata.paths import PARQUET_PATH, all_session_dirs, get_session_ind
+from eadata.globals import SRATE, TIMESTAMP_FORMAT
+from eadata.instrumentation import stage, staged
+from eadata.paths import DATASET_PATH, PARQUET_PATH, all_session_dirs, get_session_ind
 
+logger = logging.getLogger(__name__)
 
+# Output layouts: 'sessions' writes `parquet/<pid>/<session_ind>/<block>.parquet`, 'hive' writes a
+# hive-partitioned dataset `parquet/dataset/pid=<pid>/session=<session_ind>/date=<date>/*.parquet`
+LAYOUTS = ['sessions', 'hive']
+
+# Named sets of `pq.write_table` options, selected with `parquet_profile`. Row group sizes are in
+# samples. 'default' keeps the pyarrow defaults (one row group per hour block, snappy, dictionary
+# encoding attempted on every column).
+PARQUET_PROFILES: Dict[str, Dict[str, Any]] = {
+    'default': {},
+    # Minute row groups with statistics and a page index, so short windows can be read selectively
+    'minute': {
+        'row_group_size': 60 * SRATE,
+        'compression': 'zstd',
+        'compression_level': 3,
+        'use_dictionary': False,
+        'use_byte_stream_split': True,
+        'write_statistics': True,
+        'write_page_index': True,
+    },
+    # Smallest files, for archiving
+    'compact': {
+        'row_group_size': 10 * 60 * SRATE,
+        'compression': 'zstd',
+        'compression_level': 9,
+        'use_dictionary': False,
+        'use_byte_stream_split': True,
+        'write_statistics': True,
+    },
+    # Cheapest to write and read
+    'fast': {
+        'row_group_size': 10 * 60 * SRATE,
+        'compression': 'lz4',
+        'use_dictionary': False,
+        'write_statistics': False,
+    },
+}
+
+# Profiles whose unsupported options have already been warned about
+_warned_profiles = set()
+
+
+@staged('save_session_to_parquet')
 def save_session_to_parquet(
     df: pd.DataFrame,
     session_dir: Path,
     win_size: int = 1 * 60 * 60,
     win_step: int = 1 * 60 * 60,
-) -> None:
+    parquet_profile: str = 'default',
+    layout: str = 'sessions',
+) -> List[Path]:
     """Splits session df to 1 hour chunks and saves to Parquet following session_dir dirs.
 
     Args:
@@ -21,23 +72,126 @@ def save_session_to_parquet(
         session_dir: Path of session directory.
         win_size: size of window in seconds.
         win_step: time to step by in seconds.
+        parquet_profile: Name of parquet write options to use, see `PARQUET_PROFILES`.
+        layout: Output layout, see `LAYOUTS`.
+
+    Returns:
+        Paths of the parquet files written.
+    """
+    pq_dir = get_session_parquet_dir(session_dir, layout)
+    pq_paths = []
+
+    # Iterate over window starts and select window of data. The index is sorted, so each window
+    # can be located by binary search rather than masking the whole index.
+    chunk_starts = pd.date_range(start=df.index[0], end=df.index[-1], freq=f"{win_step}S")
+    chunk_bounds = df.index.searchsorted(chunk_starts)
+    chunk_ends = df.index.searchsorted(chunk_starts + pd.Timedelta(seconds=win_size))
+    for start, i_start, i_end in zip(chunk_starts, chunk_bounds, chunk_ends):
+        with stage('slice_blocks') as counters:
+            chunk = df.iloc[i_start:i_end]
+
+            # Try dropping time to see if this makes files smaller.
+            chunk = chunk.reset_index().drop('index', axis=1)
+            table = pa.Table.from_pandas(chunk)
+            counters['rows'] += table.num_rows
+
+        # Save chunk as parquet
+        pq_path = get_block_path(pq_dir, start, layout)
+        write_table_atomic(table, pq_path, parquet_profile)
+        pq_paths.append(pq_path)
+
+    return pq_paths
+
+
+def write_table_atomic(table: pa.Table, pq_path: Path, parquet_profile: str = 'default') -> None:
+    """Writes table to parquet so that a complete file or no file appears at `pq_path`.
+
+    The table is written to a temporary file alongside `pq_path` (with a `.tmp` suffix, so it's
+    never picked up as a `.parquet` file) and then renamed into place.
+
+    Args:
+        table: Table to write.
+        pq_path: Destination path.
+        parquet_profile: Name of parquet write options to use, see `PARQUET_PROFILES`.
+    """
+    with stage('write_parquet') as counters:
+        tmp_path = pq_path.with_name(pq_path.name + '.tmp')
+        pq.write_table(table, tmp_path, **get_write_options(parquet_profile, table.schema))
+        os.replace(tmp_path, pq_path)
+        counters['rows'] += table.num_rows
+        counters['bytes'] += pq_path.stat().st_size
+
+
+def get_write_options(parquet_profile: str, schema: pa.Schema) -> Dict[str, Any]:
+    """Get `pq.write_table` options of a profile for a table.
+
+    Byte-stream-split encoding is only applied to float columns, and options not supported by the
+    installed version of pyarrow are dropped (with a warning, logged once per profile).
+
+    Args:
+        parquet_profile: Name of profile in `PARQUET_PROFILES`.
+        schema: Schema of table to write.
+
+    Returns:
+        Keyword arguments for `pq.write_table`.
+    """
+    assert parquet_profile in PARQUET_PROFILES, \
+        f"{parquet_profile} not in {list(PARQUET_PROFILES)}"
+    options = dict(PARQUET_PROFILES[parquet_profile])
+
+    if options.get('use_byte_stream_split'):
+        options['use_byte_stream_split'] = [
+            field.name for field in schema if pa.types.is_floating(field.type)
+        ]
+
+    supported = inspect.signature(pq.write_table).parameters
+    unsupported = [k for k in options if k not in supported]
+    if len(unsupported) > 0 and parquet_profile not in _warned_profiles:
+        _warned_profiles.add(parquet_profile)
+        logger.warning(
+            f"Options {unsupported} of parquet profile {parquet_profile!r} aren't supported by "
+            f"pyarrow {pa.__version__}, so they're ignored. Upgrade pyarrow to use them.")
+    return {k: v for k, v in options.items() if k in supported}
+
+
+def get_session_parquet_dir(session_dir: Path, layout: str = 'sessions') -> Path:
+    """Get (and create) directory for converted session of data.
+
+    Args:
+        session_dir: Path of session directory.
+        layout: Output layout, see `LAYOUTS`.
+
+    Returns:
+        Path to `parquet/<pid>/<session_ind>`, or `parquet/dataset/pid=<pid>/session=<session_ind>`
+        for the 'hive' layout.
     """
     pid, session_timestamp = session_dir.parts[-3], session_dir.parts[-1]
     session_ind = get_session_ind(pid, session_timestamp)
 
-    # Make directory for converted session of data
-    pq_dir = Path(PARQUET_PATH) / pid / session_ind
+    pq_dir = get_session_output_dir(pid, session_ind, layout)
     pq_dir.mkdir(parents=True, exist_ok=True)
+    return pq_dir
 
-    # Iterate over window starts and select window of data
-    chunk_starts = pd.date_range(start=df.index[0], end=df.index[-1], freq=f"{win_step}S")
-    for start in chunk_starts:
-        chunk = df[(df.index >= start) & (df.index < start + pd.Timedelta(seconds=win_size))]
 
-        # Try dropping time to see if this makes files smaller.
-        chunk = chunk.reset_index().drop('index', axis=1)
+def get_session_output_dir(patient_id: str, session_ind: str, layout: str = 'sessions') -> Path:
+    assert layout in LAYOUTS, f"{layout} not in {LAYOUTS}"
+    if layout == 'hive':
+        return Path(DATASET_PATH) / f'pid={patient_id}' / f'session={session_ind}'
+    return Path(PARQUET_PATH) / str(patient_id) / session_ind
 
-        # Save chunk as parquet
-        table = pa.Table.from_pandas(chunk)
-        pq_path = pq_dir / start.strftime('UTC-%Y_%m_%d-%H_%M_%S.parquet')
-        pq.write_table(table, pq_path)
+
+def get_block_path(pq_dir: Path, block_start: pd.Timestamp, layout: str = 'sessions') -> Path:
+    """Get path of hour block in a session output dir (creating its date partition if needed).
+
+    Args:
+        pq_dir: Output dir of session, see `get_session_parquet_dir`.
+        block_start: Start time of block (UTC).
+        layout: Output layout, see `LAYOUTS`.
+
+    Returns:
+        Path to block.
+    """
+    if layout == 'hive':
+        pq_dir = pq_dir / f"date={block_start.strftime('%Y-%m-%d')}"
+        pq_dir.mkdir(exist_ok=True)
+    return pq_dir / block_start.strftime(f'{TIMESTAMP_FORMAT}.parquet')
@@ -0,0 +1,175 @@
+"""Array-backed buffer of session data on the `SRATE` sample grid."""
+import math
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pytz import timezone, utc
+
+from eadata.globals import CHANNEL_NAMES, DTYPES, SRATE
+from .time_axis import NS_PER_SECOND, TimeAxis, to_ns
+
+COLUMNS = [col for dtype in DTYPES for col in CHANNEL_NAMES[dtype]]
+
+
+class SessionBuffer:
+    """Block of session data allocated once on the `SRATE` grid.
+
+    Data is stored channel-major (one contiguous row per channel) and initialised to NaN, so any
+    samples not written to are padding. Channel data is written at integer sample offsets, so no
+    timestamps are created unless `to_dataframe` is asked for an index.
+
+    Args:
+        axis: Time axis of the buffer.
+        columns: Column names.
+    """
+
+    def __init__(self, axis: TimeAxis, columns: List[str] = COLUMNS):
+        self.axis = axis
+        self.columns = list(columns)
+        self.data = np.full((len(self.columns), len(axis)), np.nan, dtype=np.float32)
+
+    @property
+    def start(self) -> pd.Timestamp:
+        """Time of the first sample in the buffer (UTC)."""
+        return self.axis.start
+
+    @property
+    def n_samples(self) -> int:
+        """Number of samples in the buffer."""
+        return self.axis.length
+
+    @property
+    def srate(self) -> float:
+        """Sample rate of the grid."""
+        return self.axis.rate
+
+    def write(self, columns: List[str], data: np.ndarray, offset: int, step: int = 1) -> None:
+        """Writes channel data into the buffer at a sample offset.
+
+        Samples falling outside the buffer are dropped.
+
+        Args:
+            columns: Column names of the rows of `data`.
+            data: Array with shape (len(columns), n).
+            offset: Buffer position of the first sample of `data`.
+            step: Spacing between consecutive samples of `data` in the buffer.
+        """
+        skip = max(0, math.ceil(-offset / step))
+        first = offset + skip * step
+        n = min(data.shape[1] - skip, math.ceil((self.n_samples - first) / step))
+        if n <= 0:
+            return
+
+        rows = [self.columns.index(col) for col in columns]
+        self.data[rows, first:first + n * step:step] = data[:, skip:skip + n]
+
+    def write_file(self, file: Any, columns: List[str], offset: int) -> None:
+        """Writes samples of an EDF file that fall within the buffer.
+
+        Only the samples overlapping the buffer are read from the file.
+
+        Args:
+            file: EDF file opened by `load_session_data`.
+            columns: Column names of the channels in file.
+            offset: Buffer position of the first sample of file.
+        """
+        ratio = self.srate / file.info['sfreq']
+        sample_start = max(0, math.floor(-offset / ratio))
+        sample_stop = min(file.n_times, math.ceil((self.n_samples - offset) / ratio) + 1)
+        if sample_start >= sample_stop:
+            return
+
+        data = file.get_data(start=sample_start, stop=sample_stop)
+        if ratio == int(ratio):
+            # Samples are evenly spaced on the grid, so they can be placed with a strided slice
+            step = int(ratio)
+            self.write(columns, data, offset + sample_start * step, step)
+        else:
+            samples = np.arange(sample_start, sample_stop)
+            positions = offset + grid_position(samples, file, self.srate)
+            mask = (positions >= 0) & (positions < self.n_samples)
+            rows = [self.columns.index(col) for col in columns]
+            self.data[np.ix_(rows, positions[mask])] = data[:, mask]
+
+    def mask_incomplete(self) -> None:
+        """Sets samples to NaN wherever any channel is missing (i.e. an inner join)."""
+        self.data[:, np.isnan(self.data).any(axis=0)] = np.nan
+
+    def to_dataframe(self, index: bool = True) -> pd.DataFrame:
+        """Wraps buffer in a dataframe without copying the data.
+
+        Args:
+            index: Whether to add a UTC DatetimeIndex, otherwise a RangeIndex is used.
+
+        Returns:
+            Dataframe with a column for each channel.
+        """
+        df_index = self.axis.to_index() if index else None
+        return pd.DataFrame(self.data.transpose(), index=df_index, columns=self.columns)
+
+    def to_table(self) -> pa.Table:
+        """Wraps buffer in an arrow table without copying the data or creating pandas objects.
+
+        Each channel row is contiguous float32, so each column's data is a zero-copy view of it.
+        NaN padding is marked as null, as in tables converted from pandas (see `to_dataframe`).
+
+        Returns:
+            Table with a column for each channel.
+        """
+        return pa.Table.from_arrays(
+            [pa.array(row, from_pandas=True) for row in self.data],
+            names=self.columns,
+        )
+
+
+def get_session_layout(
+    files: Dict[str, Any],
+    win_size: int = 1 * 60 * 60,
+) -> Tuple[TimeAxis, Dict[str, int]]:
+    """Locates each channel group of a session on the `SRATE` grid.
+
+    The grid starts at the beginning of the block (of `win_size` seconds) containing the earliest
+    file start. Offsets are computed from `meas_date` of each file.
+
+    Args:
+        files: Dictionary of DTYPE files, see `load_session_data`.
+        win_size: size of block in seconds.
+
+    Returns:
+        Tuple of the grid (running up to and including the last sample of any file) and the grid
+        offset of each (valid) file.
+    """
+    starts = {
+        dtype: to_ns(get_start_from_file(file))
+        for dtype, file in files.items() if file is not None
+    }
+    block_ns = win_size * NS_PER_SECOND
+    origin = TimeAxis(min(starts.values()) // block_ns * block_ns, SRATE, 0)
+    offsets = {dtype: origin.index(start, 'nearest') for dtype, start in starts.items()}
+    n_grid = max(
+        offsets[dtype] + int(grid_position(files[dtype].n_times - 1, files[dtype])) + 1
+        for dtype in offsets
+    )
+    return origin.window(0, n_grid), offsets
+
+
+def grid_position(sample: Any, file: Any, srate: int = SRATE) -> Any:
+    """Position of file samples on the grid relative to the start of the file."""
+    return np.round(np.asarray(sample) * srate / file.info['sfreq']).astype(np.int64)
+
+
+def get_start_from_file(file: Any) -> pd.Timestamp:
+    """Get start time of file. First loads as US/Central time, then converted to UTC.
+
+    Args:
+        file: EDF file opened by `load_session_data`.
+
+    Returns:
+        Start time of file (UTC).
+    """
+    tz = timezone('US/Central')
+    start = file.info['meas_date'].replace(tzinfo=tz)
+    start = start.astimezone(utc)
+    return pd.to_datetime(start)
@@ -0,0 +1,93 @@
+"""Streaming conversion of a session to hour blocks of parquet."""
+import math
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from eadata.globals import CHANNEL_NAMES, SRATE
+from eadata.instrumentation import stage, staged
+from .get_session_dataframe import load_session_data
+from .native_blocks import STORAGE_MODES, get_native_layout, to_native_table
+from .save_session_to_parquet import get_block_path, get_session_parquet_dir, write_table_atomic
+from .session_buffer import SessionBuffer, get_session_layout
+
+
+@staged('stream_session_to_parquet')
+def stream_session_to_parquet(
+    session_dir: Path,
+    backend: str = 'native',
+    win_size: int = 1 * 60 * 60,
+    parquet_profile: str = 'default',
+    layout: str = 'sessions',
+    storage: str = 'grid',
+) -> Optional[List[Path]]:
+    """Converts a session directory to parquet one block of time at a time.
+
+    Produces the same files as `get_session_dataframe` followed by `save_session_to_parquet`, but
+    only reads the EDF samples that fall within the current block, so peak memory is bounded by the
+    block size rather than the session length.
+
+    Args:
+        session_dir: Path to session directory.
+        backend: EDF reader to use, either 'native' or 'mne'.
+        win_size: size of block in seconds.
+        parquet_profile: Name of parquet write options to use, see `PARQUET_PROFILES`.
+        layout: Output layout, see `LAYOUTS`.
+        storage: Either 'grid' (all channels on the `SRATE` grid) or 'native' (each channel group
+            at its native rate, see `native_blocks`).
+
+    Returns:
+        Paths of the parquet files written. If all the channel groups are bad (nothing is written),
+        returns None.
+    """
+    files = load_session_data(session_dir, backend=backend)
+    if all(f is None for f in files.values()):
+        return None
+
+    assert storage in STORAGE_MODES, f"{storage} not in {STORAGE_MODES}"
+    if storage == 'native':
+        _, offsets = get_session_layout(files, win_size)
+        native_layout = get_native_layout(files, offsets)
+
+    pq_dir = get_session_parquet_dir(session_dir, layout)
+    pq_paths = []
+    for buffer in iter_session_blocks(files, win_size):
+        with stage('to_table') as counters:
+            if storage == 'native':
+                table = to_native_table(buffer.data, buffer.columns, native_layout)
+            else:
+                table = buffer.to_table()
+            counters['rows'] += table.num_rows
+        pq_path = get_block_path(pq_dir, buffer.start, layout)
+        write_table_atomic(table, pq_path, parquet_profile)
+        pq_paths.append(pq_path)
+
+    return pq_paths
+
+
+def iter_session_blocks(
+    files: Dict[str, Any],
+    win_size: int = 1 * 60 * 60,
+) -> Iterator[SessionBuffer]:
+    """Iterates over UTC-aligned blocks of a session on the `SRATE` grid.
+
+    Each channel group is placed on the grid at the integer sample offset of its start time, and
+    samples not covered by any file are NaN (i.e. the first and last blocks are padded).
+
+    Args:
+        files: Dictionary of DTYPE files, see `load_session_data`.
+        win_size: size of block in seconds.
+
+    Yields:
+        Buffer of each block, with columns corresponding to data types (in order of DTYPES).
+    """
+    grid, offsets = get_session_layout(files, win_size)
+    block_len = win_size * SRATE
+
+    for i_block in range(math.ceil(len(grid) / block_len)):
+        with stage('read_edf') as counters:
+            buffer = SessionBuffer(grid.window(i_block * block_len, block_len))
+            for dtype, offset in offsets.items():
+                buffer.write_file(files[dtype], CHANNEL_NAMES[dtype], offset - i_block * block_len)
+            counters['rows'] += buffer.n_samples
+            counters['bytes'] += buffer.data.nbytes
+        yield buffer
@@ -0,0 +1,134 @@
+"""Compact representation of regularly sampled time axes."""
+from datetime import datetime
+from typing import Any, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+NS_PER_SECOND = 10**9
+ROUNDINGS = ['floor', 'ceil', 'nearest']
+
+
+class TimeAxis:
+    """Time axis of a regularly sampled signal, stored as its start, sample rate and length.
+
+    Times and sample indices are mapped to each other with integer arithmetic, so no timestamps are
+    created unless `to_index` is called. Times are given as anything accepted by `to_ns`.
+
+    Args:
+        start_ns: Time of the first sample, in nanoseconds since the epoch (UTC).
+        rate: Sample rate in Hz.
+        length: Number of samples.
+    """
+
+    __slots__ = ('start_ns', 'rate', 'length')
+
+    def __init__(self, start_ns: int, rate: float, length: int):
+        assert rate > 0, "Expected positive `rate`."
+        assert length >= 0, "Expected non-negative `length`."
+        self.start_ns = int(start_ns)
+        self.rate = int(rate) if rate == int(rate) else rate
+        self.length = int(length)
+
+    @classmethod
+    def from_time(cls, start: Any, rate: float, length: int) -> 'TimeAxis':
+        """Create time axis starting at a time (UTC if no timezone is given)."""
+        return cls(to_ns(start), rate, length)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, TimeAxis) and (
+            (self.start_ns, self.rate, self.length) == (other.start_ns, other.rate, other.length)
+        )
+
+    def __repr__(self) -> str:
+        return f"TimeAxis(start={self.start}, rate={self.rate}, length={self.length})"
+
+    @property
+    def start(self) -> pd.Timestamp:
+        """Time of the first sample (UTC)."""
+        return pd.Timestamp(self.start_ns, tz='UTC')
+
+    @property
+    def end_ns(self) -> int:
+        """Time just after the last sample (i.e. the time of sample `length`)."""
+        return self.time_ns(self.length)
+
+    def time_ns(self, i: Any) -> Any:
+        """Times of samples in nanoseconds since the epoch.
+
+        Args:
+            i: Sample index, or array of sample indices (may lie outside the axis).
+
+        Returns:
+            Time of sample as an int, or an int64 array for an array of indices.
+        """
+        if np.ndim(i) == 0:
+            return self.start_ns + _divide(int(i) * NS_PER_SECOND, self.rate, 'nearest')
+        i = np.asarray(i, dtype=np.int64)
+        return self.start_ns + _divide(i * NS_PER_SECOND, self.rate, 'nearest')
+
+    def index(self, t: Any, rounding: Optional[str] = 'floor') -> Any:
+        """Sample indices of times.
+
+        Args:
+            t: Time, or array of int64 nanoseconds or datetime64 times (may lie outside the axis).
+            rounding: How to round times between samples, one of ROUNDINGS, or None to return
+                fractional indices.
+
+        Returns:
+            Index of sample as an int (or float if `rounding` is None), or an array for an array of
+            times.
+        """
+        assert rounding is None or rounding in ROUNDINGS, f"{rounding} not in {ROUNDINGS}"
+        offset = to_ns(t) - self.start_ns
+        if rounding is None:
+            return offset * self.rate / NS_PER_SECOND
+        return _divide(offset * self.rate, NS_PER_SECOND, rounding)
+
+    def window(self, start: int, length: int) -> 'TimeAxis':
+        """Time axis of `length` samples starting at sample `start` (may extend past the axis)."""
+        return TimeAxis(self.time_ns(start), self.rate, length)
+
+    def to_index(self) -> pd.DatetimeIndex:
+        """Expands the time axis into a UTC DatetimeIndex with an element per sample."""
+        return pd.date_range(
+            self.start,
+            periods=self.length,
+            freq=pd.Timedelta(seconds=1 / self.rate),
+        )
+
+
+def to_ns(t: Union[int, str, datetime, pd.Timestamp, np.ndarray]) -> Any:
+    """Nanoseconds since the epoch of a time (UTC if no timezone is given).
+
+    Args:
+        t: Time as an int of nanoseconds, a string, datetime or Timestamp, or an array of int64
+            nanoseconds or datetime64 times.
+
+    Returns:
+        Nanoseconds as an int, or as an int64 array if `t` is an array.
+    """
+    if isinstance(t, (int, np.integer)):
+        return int(t)
+    if isinstance(t, np.ndarray):
+        return t.astype('datetime64[ns]').astype(np.int64)
+    t = pd.Timestamp(t)
+    if t.tzinfo is None:
+        t = t.tz_localize('UTC')
+    return t.value
+
+
+def _divide(numerator: Any, denominator: Union[int, float], rounding: str) -> Any:
+    """Divides and rounds to an integer, exactly if all values are integers."""
+    if isinstance(denominator, float) or np.asarray(numerator).dtype.kind == 'f':
+        quotient = np.asarray(numerator) / denominator
+        rounded = {'floor': np.floor, 'ceil': np.ceil, 'nearest': np.round}[rounding](quotient)
+        return int(rounded) if np.ndim(rounded) == 0 else rounded.astype(np.int64)
+    if rounding == 'floor':
+        return numerator // denominator
+    if rounding == 'ceil':
+        return -(-numerator // denominator)
+    return (2 * numerator + denominator) // (2 * denominator)
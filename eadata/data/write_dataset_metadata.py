@@ -0,0 +1,114 @@
+"""Summary metadata files for the hive-partitioned dataset layout."""
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from eadata.instrumentation import stage, staged
+from eadata.paths import DATASET_PATH
+from .native_blocks import get_block_layout
+
+# Row group metadata of the files of a session partition (with paths relative to the root of the
+# dataset), cached so that only the footers of new or modified sessions are read
+SESSION_METADATA_NAME = '_session_metadata'
+
+
+@staged('write_dataset_metadata')
+def write_dataset_metadata(dataset_dir: Path = DATASET_PATH) -> None:
+    """Writes `_metadata` and `_common_metadata` summary files for a partitioned dataset.
+
+    `_common_metadata` holds the schema of the files, and `_metadata` additionally holds the row
+    group metadata of every file (with paths relative to `dataset_dir`), so a scan can be planned
+    and partitions pruned without listing the dataset or opening every file, e.g.
+
+        pyarrow.dataset.parquet_dataset(dataset_dir / '_metadata', partitioning='hive')
+
+    The row group metadata of each session partition is cached in a `_session_metadata` file, which
+    is only rebuilt when the files of the session are added, removed or modified, so the footers of
+    unchanged sessions aren't read again. The summaries don't hold per-file key-value metadata.
+
+    Both files are replaced atomically. If the dataset is empty, any existing summary files are
+    removed.
+
+    Args:
+        dataset_dir: Root of dataset.
+
+    Raises:
+        ValueError: If any files are stored in native storage (see `data.native_blocks`), or if
+            sessions have different schemas.
+    """
+    dataset_dir = Path(dataset_dir)
+    summaries = [_get_session_metadata(d, dataset_dir) for d in sorted(dataset_dir.glob('*=*/*=*'))]
+    summaries = [summary for summary in summaries if summary is not None]
+    if len(summaries) == 0:
+        for name in ['_metadata', '_common_metadata']:
+            (dataset_dir / name).unlink(missing_ok=True)
+        return
+
+    schema = summaries[0].schema.to_arrow_schema().remove_metadata()
+    mismatched = [
+        summary.row_group(0).column(0).file_path for summary in summaries
+        if not summary.schema.to_arrow_schema().remove_metadata().equals(schema)
+    ]
+    if len(mismatched) > 0:
+        raise ValueError(
+            f"Schemas of {len(mismatched)} sessions differ from the rest of {dataset_dir}, "
+            f"e.g. {mismatched[:5]}. Reconvert them with the same options.")
+
+    _write_metadata_atomic(schema, dataset_dir / '_common_metadata')
+    _write_metadata_atomic(schema, dataset_dir / '_metadata', summaries)
+
+
+def _get_session_metadata(session_dir: Path, dataset_dir: Path) -> Optional[pq.FileMetaData]:
+    """Loads row group metadata of a session partition, rebuilding its cache if it's stale.
+
+    Args:
+        session_dir: Session partition, e.g. `pid=<pid>/session=<session_ind>`.
+        dataset_dir: Root of dataset.
+
+    Returns:
+        Row group metadata of the files of the session, or None if it has no files.
+    """
+    summary_path = session_dir / SESSION_METADATA_NAME
+    pq_paths = sorted(session_dir.glob('**/*.parquet'))
+    if len(pq_paths) == 0:
+        summary_path.unlink(missing_ok=True)
+        return None
+
+    keys = [p.relative_to(dataset_dir).as_posix() for p in pq_paths]
+    if summary_path.exists():
+        summary = pq.read_metadata(summary_path)
+        cached_keys = sorted({
+            summary.row_group(i).column(0).file_path for i in range(summary.num_row_groups)
+        })
+        mtime_ns = max(p.stat().st_mtime_ns for p in pq_paths)
+        if cached_keys == keys and summary_path.stat().st_mtime_ns >= mtime_ns:
+            return summary
+
+    with stage('read_footers') as counters:
+        file_metadatas = []
+        for pq_path, key in zip(pq_paths, keys):
+            file_metadata = pq.read_metadata(pq_path)
+            if get_block_layout(file_metadata.schema.to_arrow_schema()) is not None:
+                raise ValueError(
+                    f"{pq_path} is in native storage, which isn't supported by the hive layout.")
+            file_metadata.set_file_path(key)
+            file_metadatas.append(file_metadata)
+            counters['rows'] += file_metadata.num_rows
+            counters['bytes'] += file_metadata.serialized_size
+
+    schema = file_metadatas[0].schema.to_arrow_schema().remove_metadata()
+    _write_metadata_atomic(schema, summary_path, file_metadatas)
+    return pq.read_metadata(summary_path)
+
+
+def _write_metadata_atomic(
+    schema: pa.Schema,
+    path: Path,
+    metadata_collector: Optional[List[pq.FileMetaData]] = None,
+) -> None:
+    tmp_path = path.with_name(path.name + '.tmp')
+    pq.write_metadata(schema, tmp_path, metadata_collector=metadata_collector)
+    os.replace(tmp_path, path)
@@ -1,5 +1,14 @@
 PATIENT_IDS = ['1110', '1869', '1876', '1904', '1965', '2002']
 DTYPES = ['ACC', 'BVP', 'EDA', 'HR', 'TEMP']
+CHANNEL_NAMES = {
+    'ACC': ['acc_x', 'acc_y', 'acc_z', 'acc_mag'],
+    'BVP': ['bvp'],
+    'EDA': ['eda'],
+    'HR': ['hr'],
+    'TEMP': ['temp'],
+}
+# Native sample rates of the Empatica E4
+DTYPE_SRATES = {'ACC': 32, 'BVP': 64, 'EDA': 4, 'HR': 1, 'TEMP': 4}
 SRATE = 128
 
 SPLIT_NAMES = ['train', 'test']
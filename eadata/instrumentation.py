@@ -0,0 +1,281 @@
+"""Per-stage timing and counters of commands, reported to artifacts.
+
+Commands decorated with `instrumented` collect a record for each `stage` entered while they run
+(wall time, and rows and bytes counted by the stage), tagged with the session being processed.
+Pool workers collect the records of each task with `worker_records` and return them to be added to
+the command's records with `merge_records`. When the command finishes, the records are aggregated
+and written to `artifacts/reports/history/<command>_<pid>_<started>.json`, so a rerun (e.g. one
+with nothing left to do) doesn't replace the report of an earlier run. The report of the latest run
+is also written to `artifacts/reports/<command>_<pid>.json` and `<command>_<pid>.prom` (in the
+Prometheus textfile format).
+
+If the `EADATA_PROFILE` environment variable is set (see `eadata --profile`), commands are also run
+under cProfile, with a stats file for the main process and for each pool worker in
+`artifacts/reports/profiles`.
+"""
+import cProfile
+import functools
+import inspect
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .paths import ARTIFACTS_PATH
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV = 'EADATA_PROFILE'
+COUNTERS = ['rows', 'bytes']
+# Format of start time in the names of the reports kept in `reports/history`
+HISTORY_TIME_FORMAT = '%Y%m%dT%H%M%S.%fZ'
+
+# Records of the running command (None when no command is being instrumented), and the sessions of
+# the stages currently entered
+_records = None
+_sessions = []
+
+# Command being instrumented, and the process it's running in (pool workers are other processes)
+_command = None
+_main_pid = None
+_profiler = None
+_profiler_pid = None
+
+
+def get_reports_dir() -> Path:
+    return Path(ARTIFACTS_PATH) / 'reports'
+
+
+@contextmanager
+def stage(name: str, session: Optional[str] = None) -> Iterator[Dict[str, int]]:
+    """Records wall time and counters of a stage of a command.
+
+    Nothing is recorded unless a command is being instrumented (see `instrumented` and
+    `worker_records`).
+
+    Args:
+        name: Name of stage. Stages may be nested, and each is recorded separately.
+        session: Session being processed (defaults to the session of the enclosing stage).
+
+    Yields:
+        Counters of stage (see COUNTERS), to be incremented by the caller.
+    """
+    counters = {counter: 0 for counter in COUNTERS}
+    if _records is None:
+        yield counters
+        return
+
+    session = session if session is not None else (_sessions[-1] if _sessions else None)
+    _sessions.append(session)
+    start = time.perf_counter()
+    try:
+        yield counters
+    finally:
+        _sessions.pop()
+        _records.append({
+            'stage': name,
+            'session': session,
+            'wall_s': time.perf_counter() - start,
+            **counters,
+        })
+
+
+def staged(name: str) -> Callable[[Callable], Callable]:
+    """Decorates a function to record each call as a stage, see `stage`."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def instrumented(command: str) -> Callable[[Callable], Callable]:
+    """Decorates a command to record its stages and write a report when it finishes.
+
+    Args:
+        command: Name of command, used in the report.
+
+    Returns:
+        Decorator.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            global _records, _command, _main_pid
+            if _records is not None:
+                # Called by another instrumented command, so stages are reported by the caller
+                return func(*args, **kwargs)
+
+            arguments = inspect.signature(func).bind_partial(*args, **kwargs).arguments
+            patient_id = arguments.get('patient_id')
+            _records, _command, _main_pid = [], command, os.getpid()
+            started = datetime.now(timezone.utc)
+            status = 'failed'
+            try:
+                with _profile(command), stage(command):
+                    result = func(*args, **kwargs)
+                status = 'ok'
+                return result
+            finally:
+                records, _records, _command = _records, None, None
+                write_report(command, patient_id, records, started, status)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def worker_records() -> Iterator[List[Dict[str, Any]]]:
+    """Collects records of a task run in a pool worker (profiling it if enabled).
+
+    Yields:
+        List which is filled with the records of stages entered in the task, to be returned to the
+        main process and added to the command's records with `merge_records`.
+    """
+    global _records
+    outer, _records = _records, []
+    records = _records
+    try:
+        if os.getpid() != _main_pid:
+            with _profile(f"{_command or 'task'}-worker"):
+                yield records
+        else:
+            yield records
+    finally:
+        _records = outer
+
+
+def merge_records(records: List[Dict[str, Any]]) -> None:
+    """Adds records collected by a pool worker to the records of the running command."""
+    if _records is not None:
+        _records.extend(records)
+
+
+def summarise_records(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregates stage records in total, and per session.
+
+    Args:
+        records: Records of stages, see `stage`.
+
+    Returns:
+        Dictionary with `stages` mapping each stage to its number of calls, total wall time and
+        counters, and `sessions` mapping each session to the same summary of its stages.
+    """
+    def add(summary: Dict[str, Dict[str, float]], record: Dict[str, Any]) -> None:
+        totals = summary.setdefault(record['stage'], {'calls': 0, 'wall_s': 0.0, **{
+            counter: 0 for counter in COUNTERS
+        }})
+        totals['calls'] += 1
+        for key in ['wall_s', *COUNTERS]:
+            totals[key] += record[key]
+
+    stages, sessions = {}, {}
+    for record in records:
+        add(stages, record)
+        if record['session'] is not None:
+            add(sessions.setdefault(str(record['session']), {}), record)
+    return {'stages': stages, 'sessions': sessions}
+
+
+def write_report(
+    command: str,
+    patient_id: Optional[str],
+    records: List[Dict[str, Any]],
+    started: Optional[datetime] = None,
+    status: str = 'ok',
+) -> Path:
+    """Writes aggregated stage records of a command as JSON and as a Prometheus textfile.
+
+    The JSON report is kept in `reports/history`, named by the start time of the command, and
+    copied to `reports/<command>_<pid>.json` as the latest report. The Prometheus textfile only
+    holds the latest run.
+
+    Args:
+        command: Name of command.
+        patient_id: Patient ID the command was run for (if any).
+        records: Records of stages, see `stage`.
+        started: Start time of command.
+        status: Status of command, either 'ok' or 'failed'.
+
+    Returns:
+        Path of latest JSON report.
+    """
+    name = command if patient_id is None else f"{command}_{patient_id}"
+    reports_dir = get_reports_dir()
+    (reports_dir / 'history').mkdir(exist_ok=True, parents=True)
+
+    summary = summarise_records(records)
+    report = {
+        'command': command,
+        'patient_id': None if patient_id is None else str(patient_id),
+        'started': None if started is None else started.isoformat(),
+        'status': status,
+        **summary,
+    }
+    report_text = json.dumps(report, indent=2)
+    run_time = (started or datetime.now(timezone.utc)).strftime(HISTORY_TIME_FORMAT)
+    _write_atomic(reports_dir / 'history' / f"{name}_{run_time}.json", report_text)
+    report_path = reports_dir / f"{name}.json"
+    _write_atomic(report_path, report_text)
+
+    labels = f'command="{command}",patient_id="{patient_id or ""}"'
+    lines = []
+    for metric, key, description in [
+        ('eadata_stage_seconds_total', 'wall_s', 'Wall time spent in stage.'),
+        ('eadata_stage_calls_total', 'calls', 'Number of times stage was run.'),
+        ('eadata_stage_rows_total', 'rows', 'Rows processed by stage.'),
+        ('eadata_stage_bytes_total', 'bytes', 'Bytes processed by stage.'),
+    ]:
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+        lines += [
+            f'{metric}{{{labels},stage="{stage_name}"}} {totals[key]}'
+            for stage_name, totals in summary['stages'].items()
+        ]
+    lines += [
+        "# HELP eadata_command_success Whether the last run of command succeeded.",
+        "# TYPE eadata_command_success gauge",
+        f"eadata_command_success{{{labels}}} {int(status == 'ok')}",
+    ]
+    _write_atomic(reports_dir / f"{name}.prom", "\n".join(lines) + "\n")
+
+    logger.info(f"Saved stage report of {command} to {report_path}")
+    return report_path
+
+
+@contextmanager
+def _profile(name: str) -> Iterator[None]:
+    """Runs block under cProfile if PROFILE_ENV is set, saving cumulative stats of this process."""
+    global _profiler, _profiler_pid
+    if not os.environ.get(PROFILE_ENV):
+        yield
+        return
+
+    if _profiler is None or _profiler_pid != os.getpid():
+        if _profiler is not None:
+            # Profiler of the parent process, inherited by a forked pool worker
+            _profiler.disable()
+        _profiler, _profiler_pid = cProfile.Profile(), os.getpid()
+    _profiler.enable()
+    try:
+        yield
+    finally:
+        _profiler.disable()
+        profiles_dir = get_reports_dir() / 'profiles'
+        profiles_dir.mkdir(exist_ok=True, parents=True)
+        _profiler.dump_stats(str(profiles_dir / f"{name}-{os.getpid()}.prof"))
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(str(tmp_path), 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
@@ -0,0 +1,193 @@
+"""Persisted record of converted sessions, used to make `convert` incremental."""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .globals import DTYPES
+from .paths import ARTIFACTS_PATH, EDF_PATH, PARQUET_PATH
+
+logger = logging.getLogger(__name__)
+
+EDF_HEADER_NBYTES = 256
+
+# Options of `convert` which change its outputs, recorded in each entry (missing options are
+# assumed to be their defaults, and options that are no longer supported are ignored)
+DEFAULT_CONVERT_OPTIONS = {'layout': 'sessions', 'storage': 'grid'}
+
+
+def get_manifest_path(patient_id: str) -> Path:
+    return Path(ARTIFACTS_PATH) / str(patient_id) / 'convert_manifest.json'
+
+
+def load_manifest(patient_id: str) -> Dict[str, Dict[str, Any]]:
+    """Loads conversion manifest for a patient.
+
+    Args:
+        patient_id: Patient ID.
+
+    Returns:
+        Dictionary mapping session keys (see `get_session_key`) to manifest entries. Empty if no
+        manifest has been written yet.
+    """
+    manifest_path = get_manifest_path(patient_id)
+    if not manifest_path.exists():
+        return {}
+
+    with open(str(manifest_path), 'r') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: Dict[str, Dict[str, Any]], patient_id: str) -> None:
+    """Writes conversion manifest for a patient, replacing any previous manifest atomically.
+
+    Args:
+        manifest: Dictionary mapping session keys to manifest entries.
+        patient_id: Patient ID.
+    """
+    manifest_path = get_manifest_path(patient_id)
+    manifest_path.parent.mkdir(exist_ok=True, parents=True)
+
+    tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    with open(str(tmp_path), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def get_session_key(session_dir: Path) -> str:
+    """Key of session in manifest (`<pid>/<split>/<session_timestamp>`)."""
+    return str(Path(session_dir).relative_to(EDF_PATH))
+
+
+def get_session_fingerprint(session_dir: Path) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Get size, mtime and header hash of each DTYPE EDF file in a session dir.
+
+    Args:
+        session_dir: Path to session directory.
+
+    Returns:
+        Dictionary mapping DTYPE to file fingerprint (None if the file is missing).
+    """
+    fingerprint = {}
+    for dtype in DTYPES:
+        fp = Path(session_dir) / f"Empatica-{dtype}.edf"
+        if not fp.exists():
+            fingerprint[dtype] = None
+            continue
+
+        stat = fp.stat()
+        fingerprint[dtype] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'header_sha1': _hash_edf_header(fp),
+        }
+    return fingerprint
+
+
+def make_manifest_entry(
+    session_ind: str,
+    fingerprint: Dict[str, Optional[Dict[str, Any]]],
+    outputs: Optional[list],
+    options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Creates manifest entry for a converted session.
+
+    Args:
+        session_ind: Index of session (name of converted session dir).
+        fingerprint: Fingerprint of session EDF files, see `get_session_fingerprint`.
+        outputs: Paths of the parquet files written, or None if the session was dodgy.
+        options: Options the session was converted with, see `DEFAULT_CONVERT_OPTIONS`.
+
+    Returns:
+        Manifest entry.
+    """
+    return {
+        'session_ind': session_ind,
+        'files': fingerprint,
+        'status': 'dodgy' if outputs is None else 'converted',
+        'options': {**DEFAULT_CONVERT_OPTIONS, **(options or {})},
+        'outputs': [str(Path(p).relative_to(PARQUET_PATH)) for p in outputs or []],
+        'output_bytes': sum(Path(p).stat().st_size for p in outputs or []),
+    }
+
+
+def get_entry_options(entry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Options a session was converted with (defaults for any that weren't recorded)."""
+    options = (entry or {}).get('options', {})
+    return {k: options.get(k, v) for k, v in DEFAULT_CONVERT_OPTIONS.items()}
+
+
+def is_session_unchanged(
+    entry: Optional[Dict[str, Any]],
+    session_ind: str,
+    fingerprint: Dict[str, Optional[Dict[str, Any]]],
+    options: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """Whether a session was converted the same way by a previous run and is unchanged since."""
+    return (
+        entry is not None
+        and entry['session_ind'] == session_ind
+        and entry['files'] == fingerprint
+        and get_entry_options(entry) == {**DEFAULT_CONVERT_OPTIONS, **(options or {})}
+    )
+
+
+def get_converted_sessions(patient_id: str) -> Dict[str, Dict[str, Any]]:
+    """Get manifest entries of the sessions converted in the 'sessions' layout.
+
+    The size of the parquet files of each session (`output_bytes`) is recorded when it's converted,
+    so no files are read. Entries written before sizes were recorded are stat-ed once, and their
+    sizes saved to the manifest.
+
+    Args:
+        patient_id: Patient ID.
+
+    Returns:
+        Dictionary mapping session keys (see `get_session_key`) to manifest entries.
+    """
+    manifest = load_manifest(patient_id)
+    sessions, backfilled = {}, False
+    for key, entry in manifest.items():
+        if entry['status'] != 'converted' or get_entry_options(entry)['layout'] != 'sessions':
+            continue
+        if 'output_bytes' not in entry:
+            pq_paths = [Path(PARQUET_PATH) / p for p in entry['outputs']]
+            entry['output_bytes'] = sum(p.stat().st_size for p in pq_paths if p.exists())
+            backfilled = True
+        sessions[key] = entry
+
+    if backfilled:
+        save_manifest(manifest, patient_id)
+    return sessions
+
+
+def remove_session_outputs(entry: Optional[Dict[str, Any]], pq_dir: Path) -> None:
+    """Removes outputs of a previous conversion of a session before it's reconverted.
+
+    Deletes files recorded in the manifest entry, as well as any parquet or temporary files left in
+    the session's output dir (or its partitions) by an interrupted run.
+
+    Args:
+        entry: Previous manifest entry (if any).
+        pq_dir: Output dir of session for this run.
+    """
+    stale = [Path(PARQUET_PATH) / p for p in (entry or {}).get('outputs', [])]
+    if pq_dir.exists():
+        stale.extend(p for p in pq_dir.glob('**/*') if p.suffix in ['.parquet', '.tmp'])
+
+    for fp in stale:
+        fp.unlink(missing_ok=True)
+
+
+def _hash_edf_header(fp: Path) -> str:
+    """SHA1 of the main and signal headers of an EDF file."""
+    with open(str(fp), 'rb') as f:
+        header = f.read(EDF_HEADER_NBYTES)
+        try:
+            n_signals = int(header[252:256].decode('latin-1').strip())
+        except ValueError:
+            n_signals = 0
+        header += f.read(n_signals * EDF_HEADER_NBYTES)
+    return hashlib.sha1(header).hexdigest()
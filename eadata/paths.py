@@ -1,22 +1,29 @@
+import json
 import logging
+import os
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional
 
-from .globals import PATIENT_IDS
+from .globals import PATIENT_IDS, SPLIT_NAMES
 
 SRC_DIR = Path(__file__).absolute().parent
 ROOT_DIR = SRC_DIR.parent
 
-DATA_DIR = ROOT_DIR / 'data'
+# Can be pointed elsewhere (e.g. a synthetic dataset) with the EADATA_DATA_DIR environment variable
+DATA_DIR = Path(os.environ.get('EADATA_DATA_DIR', ROOT_DIR / 'data'))
 
 EDF_PATH = DATA_DIR / 'edf'
 PARQUET_PATH = DATA_DIR / 'parquet'
+DATASET_PATH = PARQUET_PATH / 'dataset'
 SZTIMES_PATH = DATA_DIR / 'sztimes'
 ARTIFACTS_PATH = DATA_DIR / 'artifacts'
 OUTPUT_DIR = DATA_DIR / 'output'
 
 logger = logging.getLogger(__name__)
 
+# Session indexes loaded in this process (inherited by forked workers), keyed by patient ID
+_SESSION_INDEXES: Dict[str, Dict[str, Any]] = {}
+
 
 def all_session_dirs(patient_id: str) -> List[Path]:
     """Get list of all Session dirs for a given patient.
@@ -27,18 +34,169 @@ def all_session_dirs(patient_id: str) -> List[Path]:
     Returns:
         List of paths to session dirs.
     """
+    return [Path(EDF_PATH) / s['key'] for s in get_session_index(patient_id)]
+
+
+def get_session_ind(patient_id: str, session_timestamp: str) -> str:
+    sessions = get_session_index(patient_id)
+    ind = next((s['ind'] for s in sessions if s['timestamp'] == session_timestamp), None)
+    if ind is None:
+        raise ValueError(f"No session {session_timestamp} in the EDF tree of patient {patient_id}.")
+    return ind
+
+
+def get_session_index(patient_id: str) -> List[Dict[str, Any]]:
+    """Get index of all session dirs for a given patient.
+
+    The index is built once by walking the patient's EDF tree, and cached in memory and in
+    `artifacts/<patient_id>/session_index.json`. The cache is rebuilt when the mtime of the patient
+    dir or any of its split dirs changes (i.e. when a session dir is added or removed).
+
+    Args:
+        patient_id: Patient ID.
+
+    Returns:
+        List of sessions sorted by timestamp. Each session is a dict with the session `timestamp`,
+        `split` ('training' or 'testing'), ordinal `ind` (name of the converted session dir) and
+        `key` (path relative to EDF_PATH).
+    """
+    patient_id = str(patient_id)
     assert patient_id in PATIENT_IDS, "invalid patient id"
+
+    mtimes = _get_edf_tree_mtimes(patient_id)
+    index = _SESSION_INDEXES.get(patient_id)
+    if index is None or index['mtimes'] != mtimes:
+        index_path = Path(ARTIFACTS_PATH) / patient_id / 'session_index.json'
+        index = None
+        if index_path.exists():
+            with open(str(index_path), 'r') as f:
+                index = json.load(f)
+
+        if index is None or index['mtimes'] != mtimes:
+            logger.info(f"Building session index for {patient_id = }")
+            index = {'mtimes': mtimes, 'sessions': _build_session_index(patient_id)}
+            index_path.parent.mkdir(exist_ok=True, parents=True)
+            tmp_path = index_path.with_name(index_path.name + '.tmp')
+            with open(str(tmp_path), 'w') as f:
+                json.dump(index, f, indent=2)
+            os.replace(tmp_path, index_path)
+
+        _SESSION_INDEXES[patient_id] = index
+
+    return index['sessions']
+
+
+def _get_edf_tree_mtimes(patient_id: str) -> Dict[str, int]:
+    """Get mtimes of patient EDF dir and its split dirs."""
+    patient_path = Path(EDF_PATH) / patient_id
+    if not patient_path.exists():
+        return {}
+
+    dirs = [patient_path] + [p for p in patient_path.iterdir() if p.is_dir()]
+    return {str(p.relative_to(EDF_PATH)): p.stat().st_mtime_ns for p in dirs}
+
+
+def _build_session_index(patient_id: str) -> List[Dict[str, Any]]:
     session_dirs = [
         p for p in Path(f'{EDF_PATH}/{patient_id}').glob('**/*')
         if p.is_dir() and not p.stem in ['training', 'testing']
     ]
     session_dirs = sorted(session_dirs, key=lambda p: p.stem)
-    return session_dirs
 
+    sessions = []
+    for i, session_dir in enumerate(session_dirs):
+        sessions.append({
+            'timestamp': session_dir.stem,
+            'split': session_dir.parent.name,
+            'ind': str(i).zfill(3),
+            'key': str(session_dir.relative_to(EDF_PATH)),
+        })
+    return sessions
 
-def get_session_ind(patient_id: str, session_timestamp: str) -> str:
-    session_ind = sorted([fp.stem for fp in all_session_dirs(patient_id)]).index(session_timestamp)
-    return str(session_ind).zfill(3)
+
+def get_split_manifest_path(patient_id: str) -> Path:
+    return Path(ARTIFACTS_PATH) / str(patient_id) / 'split_manifest.json'
+
+
+def load_split_manifest(patient_id: str) -> Optional[Dict[str, str]]:
+    """Loads manifest of an in-place split (see `split(in_place=True)`).
+
+    Args:
+        patient_id: Patient ID.
+
+    Returns:
+        Dictionary mapping session keys (see `manifest.get_session_key`) to split name, or None if
+        the patient's sessions haven't been split in place.
+    """
+    manifest_path = get_split_manifest_path(patient_id)
+    if not manifest_path.exists():
+        return None
+
+    with open(str(manifest_path), 'r') as f:
+        return json.load(f)
+
+
+def is_split(patient_id: str) -> bool:
+    """Whether the converted sessions of a patient have been split (in place or by moving them)."""
+    return load_split_manifest(patient_id) is not None or all(
+        (Path(PARQUET_PATH) / split_name / str(patient_id)).exists() for split_name in SPLIT_NAMES)
+
+
+def get_split_path(patient_id: str, split_name: str) -> Path:
+    """Get dir that filepaths (`<pid>/<session>/<file>`) in a split are relative to.
+
+    Args:
+        patient_id: Patient ID.
+        split_name: Name of split.
+
+    Returns:
+        PARQUET_PATH if the patient was split in place, otherwise `PARQUET_PATH/<split_name>`.
+    """
+    if load_split_manifest(patient_id) is not None:
+        return Path(PARQUET_PATH)
+    return Path(PARQUET_PATH) / split_name
+
+
+def get_split_session_dirs(patient_id: str) -> Dict[str, List[Path]]:
+    """Get converted session dirs in each split.
+
+    Split membership is read from the split manifest if the patient was split in place, otherwise
+    it's given by the split dir each session was moved to. Sessions in the split manifest are
+    located by the session index they were converted with (from the conversion manifest).
+
+    Args:
+        patient_id: Patient ID.
+
+    Returns:
+        Dictionary mapping split name to sorted session dirs.
+
+    Raises:
+        ValueError: If the split manifest doesn't cover the same sessions as the conversion
+            manifest (i.e. sessions were converted or removed after splitting).
+    """
+    # Imported here as manifest depends on paths
+    from .manifest import get_converted_sessions
+
+    split_manifest = load_split_manifest(patient_id)
+    split_dirs = {split_name: [] for split_name in SPLIT_NAMES}
+    if split_manifest is not None:
+        sessions = get_converted_sessions(patient_id)
+        stale = sorted(set(split_manifest) ^ set(sessions))
+        if len(stale) > 0:
+            raise ValueError(
+                f"Split manifest of {patient_id} doesn't match converted sessions, e.g. "
+                f"{stale[:3]}. Re-run `eadata split {patient_id} <proportions> --in_place`.")
+
+        for key, split_name in split_manifest.items():
+            session_ind = sessions[key]['session_ind']
+            split_dirs[split_name].append(Path(PARQUET_PATH) / str(patient_id) / session_ind)
+        return {split_name: sorted(dirs) for split_name, dirs in split_dirs.items()}
+
+    for split_name in SPLIT_NAMES:
+        split_path = Path(PARQUET_PATH) / split_name / str(patient_id)
+        if split_path.exists():
+            split_dirs[split_name] = sorted(p for p in split_path.iterdir() if p.is_dir())
+    return split_dirs
 
 
 def write_dodgy_sessions(dodgy_sessions: List[Path], patient_id: str) -> None:
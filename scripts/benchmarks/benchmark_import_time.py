@@ -0,0 +1,121 @@
+"""Benchmark the import time and startup of the eadata CLI.
+
+Runs each target (importing `eadata`, and printing the help of the CLI and of a light command) in
+fresh processes and reports the median wall time, along with the cumulative import time of
+`eadata` from `python -X importtime`. Heavy dependencies should only be imported by the commands
+that need them, so a target fails the benchmark if it imports any of its forbidden modules, or if
+its median wall time exceeds `--max-seconds`.
+
+Usage:
+
+    $ python3 scripts/benchmarks/benchmark_import_time.py --repeats 10 --max-seconds 1.5
+"""
+
+import argparse
+import csv
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+HEAVY_MODULES = ['mne', 'numpy', 'pandas', 'pyarrow', 'tqdm']
+
+# Arguments to the interpreter of each target, and heavy modules it's allowed to import
+TARGETS = {
+    'import eadata': (['-c', 'import eadata'], []),
+    'eadata --help': (['-m', 'eadata', '--help'], []),
+    'eadata split --help': (['-m', 'eadata', 'split', '--help'], ['numpy']),
+}
+
+
+def run_target(args: List[str]) -> Tuple[float, Set[str], int]:
+    """Runs the interpreter with `-X importtime` and the given arguments.
+
+    Args:
+        args: Arguments to the interpreter.
+
+    Returns:
+        Wall time (s), names of the modules imported, and cumulative import time of `eadata` (us).
+    """
+    t_start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    wall_time = time.perf_counter() - t_start
+    assert proc.returncode == 0, f"{args} failed:\n{proc.stderr}"
+
+    # Lines are formatted as `import time: <self us> | <cumulative us> | <indented module name>`
+    modules, eadata_us = set(), 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('imported package'):
+            continue
+        _, cumulative, name = line.split('|')
+        modules.add(name.strip())
+        if name.strip() == 'eadata':
+            eadata_us = int(cumulative)
+    return wall_time, modules, eadata_us
+
+
+def benchmark_imports(repeats: int = 10) -> List[Dict[str, Any]]:
+    """Runs each target `repeats` times (after a run to warm the bytecode cache).
+
+    Args:
+        repeats: Number of timed runs of each target.
+
+    Returns:
+        List of results, one per target.
+    """
+    results = []
+    for target, (args, allowed) in TARGETS.items():
+        run_target(args)
+        runs = [run_target(args) for _ in range(repeats)]
+        modules = set.union(*[m for _, m, _ in runs])
+        top_level = {m.split('.')[0] for m in modules}
+        results.append({
+            'target': target,
+            'median_s': statistics.median(t for t, _, _ in runs),
+            'min_s': min(t for t, _, _ in runs),
+            'eadata_import_ms': statistics.median(us for _, _, us in runs) / 1000,
+            'n_modules': len(modules),
+            'forbidden': ' '.join(m for m in HEAVY_MODULES if m in top_level and m not in allowed),
+        })
+    return results
+
+
+def main(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--max-seconds', type=float, default=None, help="Maximum median time.")
+    parser.add_argument('--output', type=Path, default=None, help="Path to write csv of results.")
+    args = parser.parse_args(args)
+
+    results = benchmark_imports(args.repeats)
+
+    failures = []
+    for r in results:
+        print(
+            f"{r['target']:>20}  median {r['median_s']:.3f}s  min {r['min_s']:.3f}s"
+            f"  eadata import {r['eadata_import_ms']:>7.1f}ms  {r['n_modules']:>4} modules")
+        if r['forbidden']:
+            failures.append(f"{r['target']} imported {r['forbidden']}")
+        if args.max_seconds is not None and r['median_s'] > args.max_seconds:
+            failures.append(f"{r['target']} took {r['median_s']:.3f}s > {args.max_seconds}s")
+
+    if args.output is not None:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+
+    if len(failures) > 0:
+        print("Import time regressions:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Compare parquet write profiles on converted hour blocks.
+
+Rewrites a sample of converted hour blocks with each profile in `PARQUET_PROFILES` and reports the
+file size, write throughput, full read throughput and the time to read a one minute window (which
+benefits from small row groups). Uses the hour blocks in PARQUET_PATH (see EADATA_DATA_DIR), or a
+synthetic session if there are none.
+
+Usage:
+
+    $ python3 scripts/benchmarks/benchmark_parquet_profiles.py --n-files 8 --output profiles.csv
+"""
+
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from eadata.data import PARQUET_PROFILES, write_table_atomic
+from eadata.globals import SRATE
+from eadata.paths import PARQUET_PATH
+
+GENERATOR_PATH = Path(__file__).absolute().parent / 'generate_synthetic_data.py'
+
+
+def benchmark_profiles(
+    tables: List[pa.Table],
+    out_dir: Path,
+    profiles: Sequence[str] = tuple(PARQUET_PROFILES),
+) -> List[Dict[str, Any]]:
+    """Writes and reads tables with each profile.
+
+    Args:
+        tables: Hour blocks to write.
+        out_dir: Directory to write files to.
+        profiles: Names of profiles to compare.
+
+    Returns:
+        List of results, one per profile.
+    """
+    n_raw = sum(t.nbytes for t in tables)
+    window_len = 60 * SRATE
+    results = []
+    for profile in profiles:
+        paths = [out_dir / f'{profile}_{i}.parquet' for i in range(len(tables))]
+
+        t_start = time.perf_counter()
+        for table, pq_path in zip(tables, paths):
+            write_table_atomic(table, pq_path, profile)
+        write_time = time.perf_counter() - t_start
+
+        t_start = time.perf_counter()
+        for pq_path in paths:
+            pq.read_table(pq_path)
+        read_time = time.perf_counter() - t_start
+
+        # Read one minute from the middle of each block, only decoding the row groups it spans
+        t_start = time.perf_counter()
+        for table, pq_path in zip(tables, paths):
+            pq_file = pq.ParquetFile(pq_path)
+            start = table.num_rows // 2
+            row_groups, offset = [], 0
+            for i in range(pq_file.metadata.num_row_groups):
+                n_rows = pq_file.metadata.row_group(i).num_rows
+                if offset < start + window_len and offset + n_rows > start:
+                    row_groups.append(i)
+                offset += n_rows
+            pq_file.read_row_groups(row_groups)
+        window_time = (time.perf_counter() - t_start) / len(tables)
+
+        n_bytes = sum(p.stat().st_size for p in paths)
+        results.append({
+            'profile': profile,
+            'n_files': len(tables),
+            'size_mb': n_bytes / 1024**2,
+            'ratio': n_raw / n_bytes,
+            'write_mb_per_s': n_raw / 1024**2 / write_time,
+            'read_mb_per_s': n_raw / 1024**2 / read_time,
+            'window_read_ms': 1000 * window_time,
+        })
+        for pq_path in paths:
+            pq_path.unlink()
+    return results
+
+
+def load_tables(pq_dir: Path, n_files: int) -> List[pa.Table]:
+    """Loads up to `n_files` hour blocks (largest first) from a parquet dir."""
+    paths = sorted(pq_dir.glob('**/*.parquet'), key=lambda p: p.stat().st_size, reverse=True)
+    return [pq.read_table(p) for p in paths[:n_files]]
+
+
+def main(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--n-files', type=int, default=8)
+    parser.add_argument('--profiles', nargs='+', default=list(PARQUET_PROFILES))
+    parser.add_argument('--output', type=Path, default=None, help="Path to write csv of results.")
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory(prefix='eadata-profiles-') as tmp_dir:
+        tables = load_tables(Path(PARQUET_PATH), args.n_files)
+        if len(tables) == 0:
+            print(f"No parquet files in {PARQUET_PATH}, converting a synthetic session")
+            data_dir = Path(tmp_dir) / 'data'
+            env = dict(os.environ, EADATA_DATA_DIR=str(data_dir))
+            subprocess.run(
+                [sys.executable, str(GENERATOR_PATH), str(data_dir), '--n-sessions', '1',
+                 '--hours', str(args.n_files)],
+                check=True,
+                env=env,
+            )
+            subprocess.run(
+                [sys.executable, '-m', 'eadata', 'convert', '1110', '--multiproc=False'],
+                check=True,
+                env=env,
+            )
+            tables = load_tables(data_dir / 'parquet', args.n_files)
+
+        results = benchmark_profiles(tables, Path(tmp_dir), args.profiles)
+
+    for r in results:
+        print(
+            f"{r['profile']:>8} {r['size_mb']:>8.1f}MB (x{r['ratio']:.2f})"
+            f"  write {r['write_mb_per_s']:>7.1f}MB/s  read {r['read_mb_per_s']:>7.1f}MB/s"
+            f"  1 min window {r['window_read_ms']:>6.1f}ms")
+
+    if args.output is not None:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""Generate a synthetic Eval AI dataset.
+
+Writes Empatica-style EDF sessions (one file per channel group in DTYPES, at the sample rates of the
+Empatica E4) and seizure times into a `data/` tree with the same layout as the real dataset, so the
+CLI can be run and benchmarked without access to the real data.
+
+Usage:
+
+    $ python3 scripts/benchmarks/generate_synthetic_data.py /tmp/eadata --n-sessions 4 --hours 2
+    $ EADATA_DATA_DIR=/tmp/eadata eadata convert 1110
+"""
+
+import argparse
+import pickle
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from pytz import timezone
+
+from eadata.globals import CHANNEL_NAMES, DTYPE_SRATES, DTYPES
+
+DTYPE_UNITS = {'ACC': 'g', 'BVP': 'nW', 'EDA': 'uS', 'HR': 'bpm', 'TEMP': 'degC'}
+PHYSICAL_RANGES = {
+    'ACC': (-2, 2),
+    'BVP': (-500, 500),
+    'EDA': (0, 100),
+    'HR': (0, 250),
+    'TEMP': (0, 50),
+}
+
+LOCAL_TZ = timezone('US/Central')
+
+
+def write_edf(
+    fp: Path,
+    labels: List[str],
+    sfreq: int,
+    data: np.ndarray,
+    start: datetime,
+    physical_dim: str = '',
+    physical_range: tuple = (-1, 1),
+) -> int:
+    """Writes digital data to an EDF file with 1 second data records.
+
+    Args:
+        fp: Path to EDF file.
+        labels: Signal labels.
+        sfreq: Sample rate of all signals.
+        data: int16 array with shape (len(labels), n_records * sfreq).
+        start: Start time (naive local time) written to the header.
+        physical_dim: Physical dimension of all signals.
+        physical_range: Physical min and max of all signals.
+
+    Returns:
+        Number of bytes written.
+    """
+    n_signals = len(labels)
+    n_records = data.shape[1] // sfreq
+
+    field = lambda value, width: str(value)[:width].ljust(width).encode('latin-1')
+    header = b''.join([
+        field(0, 8),
+        field('X X X X', 80),
+        field('Startdate X X X X', 80),
+        field(start.strftime('%d.%m.%y'), 8),
+        field(start.strftime('%H.%M.%S'), 8),
+        field(256 * (n_signals + 1), 8),
+        field('', 44),
+        field(n_records, 8),
+        field(1, 8),
+        field(n_signals, 4),
+    ])
+    signal_fields = [
+        (labels, 16),
+        ([''] * n_signals, 80),
+        ([physical_dim] * n_signals, 8),
+        ([physical_range[0]] * n_signals, 8),
+        ([physical_range[1]] * n_signals, 8),
+        ([-32768] * n_signals, 8),
+        ([32767] * n_signals, 8),
+        ([''] * n_signals, 80),
+        ([sfreq] * n_signals, 8),
+        ([''] * n_signals, 32),
+    ]
+    header += b''.join(field(v, width) for values, width in signal_fields for v in values)
+
+    # Data records hold `sfreq` samples of each signal in turn
+    records = data[:, :n_records * sfreq].reshape(n_signals, n_records, sfreq).transpose(1, 0, 2)
+    fp.parent.mkdir(parents=True, exist_ok=True)
+    with open(fp, 'wb') as f:
+        f.write(header)
+        f.write(np.ascontiguousarray(records).astype('<i2').tobytes())
+    return len(header) + records.size * 2
+
+
+def generate_dataset(
+    data_dir: Path,
+    patient_ids: Sequence[str] = ('1110',),
+    n_sessions: int = 4,
+    hours: float = 2,
+    gap: float = 30 * 60,
+    overlap_prob: float = 0.0,
+    corrupt_prob: float = 0.0,
+    seizures_per_session: float = 1.0,
+    test_prop: float = 0.25,
+    start: str = '2020-03-01 00:00:00',
+    seed: int = 0,
+) -> Dict[str, int]:
+    """Writes a synthetic dataset to `data_dir/edf` and `data_dir/sztimes`.
+
+    Args:
+        data_dir: Root of data tree (use as EADATA_DATA_DIR).
+        patient_ids: Patients to generate (must be in PATIENT_IDS).
+        n_sessions: Number of sessions per patient.
+        hours: Duration of each session in hours.
+        gap: Time between consecutive sessions in seconds.
+        overlap_prob: Probability that a session starts before the previous one ends.
+        corrupt_prob: Probability that each EDF file is truncated.
+        seizures_per_session: Average number of seizures per session.
+        test_prop: Proportion of sessions in the `testing` dir.
+        start: Start time (UTC) of the first session.
+        seed: Random seed.
+
+    Returns:
+        Totals of EDF files, bytes, samples and seizures written.
+    """
+    rng = np.random.default_rng(seed)
+    data_dir = Path(data_dir)
+    duration = int(hours * 60 * 60)
+    totals = {'files': 0, 'bytes': 0, 'samples': 0, 'seizures': 0}
+
+    for pid in patient_ids:
+        session_start = pd.Timestamp(start, tz='UTC')
+        sztimes = []
+        for i_session in range(n_sessions):
+            split = 'testing' if i_session >= n_sessions * (1 - test_prop) else 'training'
+            session_dir = data_dir / 'edf' / pid / split / str(int(session_start.timestamp()))
+
+            for dtype in DTYPES:
+                # Channel groups start a few seconds apart, as in the real data
+                file_start = session_start + pd.Timedelta(seconds=int(rng.integers(0, 5)))
+                local_start = file_start.tz_convert(LOCAL_TZ).tz_localize(None).to_pydatetime()
+                sfreq = DTYPE_SRATES[dtype]
+                data = _generate_signal(rng, len(CHANNEL_NAMES[dtype]), duration * sfreq)
+
+                fp = session_dir / f'Empatica-{dtype}.edf'
+                totals['bytes'] += write_edf(
+                    fp,
+                    CHANNEL_NAMES[dtype],
+                    sfreq,
+                    data,
+                    local_start,
+                    DTYPE_UNITS[dtype],
+                    PHYSICAL_RANGES[dtype],
+                )
+                totals['files'] += 1
+                totals['samples'] += data.size
+
+                if rng.random() < corrupt_prob:
+                    with open(fp, 'r+b') as f:
+                        f.truncate(fp.stat().st_size - int(rng.integers(1, 1000)))
+
+            n_seizures = rng.poisson(seizures_per_session)
+            offsets = np.sort(rng.integers(0, duration, size=n_seizures))
+            sztimes.extend(session_start + pd.to_timedelta(offsets, 's'))
+
+            next_start = duration + gap
+            if rng.random() < overlap_prob:
+                next_start = duration * rng.uniform(0.5, 0.9)
+            session_start += pd.Timedelta(seconds=int(next_start))
+
+        sztimes_df = pd.DataFrame({'utc': pd.Series(sorted(sztimes), dtype='datetime64[ns, UTC]')})
+        sztimes_df['local'] = sztimes_df['utc'].dt.tz_convert(LOCAL_TZ)
+        (data_dir / 'sztimes').mkdir(parents=True, exist_ok=True)
+        with open(data_dir / 'sztimes' / f'{pid}.pkl', 'wb') as f:
+            pickle.dump(sztimes_df, f)
+        totals['seizures'] += len(sztimes_df)
+
+    return totals
+
+
+def _generate_signal(rng: np.random.Generator, n_channels: int, n_samples: int) -> np.ndarray:
+    """Random walk signal, so that values compress like real data rather than white noise."""
+    steps = rng.integers(-64, 65, size=(n_channels, n_samples), dtype=np.int16)
+    return np.clip(np.cumsum(steps, axis=1, dtype=np.int32), -32768, 32767).astype(np.int16)
+
+
+def main(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('data_dir', type=Path)
+    parser.add_argument('--patient-ids', nargs='+', default=['1110'])
+    parser.add_argument('--n-sessions', type=int, default=4)
+    parser.add_argument('--hours', type=float, default=2)
+    parser.add_argument('--gap', type=float, default=30 * 60)
+    parser.add_argument('--overlap-prob', type=float, default=0.0)
+    parser.add_argument('--corrupt-prob', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(args)
+
+    totals = generate_dataset(
+        args.data_dir,
+        patient_ids=args.patient_ids,
+        n_sessions=args.n_sessions,
+        hours=args.hours,
+        gap=args.gap,
+        overlap_prob=args.overlap_prob,
+        corrupt_prob=args.corrupt_prob,
+        seed=args.seed,
+    )
+    print(totals)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Benchmark the eadata CLI on synthetic datasets.
+
+For each dataset size, generates a synthetic dataset (see `generate_synthetic_data.py`) in a temp
+dir and runs each stage of the pipeline on it as a separate process (with EADATA_DATA_DIR pointing
+at the dataset), recording wall time, CPU time and peak RSS. Throughput is reported as samples/s
+and bytes/s of the stage's input (EDF files for `convert` and `ambtimes`, parquet files otherwise).
+Runs entirely offline.
+
+Usage:
+
+    $ python3 scripts/benchmarks/run_benchmarks.py --hours 1 4 16 --output bench_output.csv
+"""
+
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).absolute().parent))
+from generate_synthetic_data import generate_dataset  # noqa: E402
+
+PATIENT_ID = '1110'
+STAGES = ['ambtimes', 'convert', 'split', 'label', 'clean']
+
+
+def get_stage_args(stage: str, multiproc: bool) -> List[str]:
+    """CLI arguments for each stage (patient ID is quoted so that fire keeps it as a string)."""
+    pid = f"'{PATIENT_ID}'"
+    return {
+        'ambtimes': ['ambtimes', pid],
+        'convert': ['convert', pid, f'--multiproc={multiproc}'],
+        'split': ['split', pid, '[0.7,0.3]'],
+        'label': ['label', pid],
+        'clean': ['clean', pid],
+    }[stage]
+
+
+def run_stage(args: List[str], data_dir: Path) -> Dict[str, float]:
+    """Runs `python -m eadata <args>` and measures its resource usage.
+
+    Peak RSS is that of the main process, so run `convert` with `--multiproc=False` to profile the
+    memory used per session.
+
+    Args:
+        args: CLI arguments.
+        data_dir: Root of data tree.
+
+    Returns:
+        Wall time (s), user + system CPU time (s) and peak RSS (MB) of the process.
+    """
+    env = dict(os.environ, EADATA_DATA_DIR=str(data_dir))
+    # stderr goes to a file rather than a pipe, which would fill up (and block the process) while
+    # waiting for it to exit
+    with tempfile.TemporaryFile() as stderr_file:
+        t_start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, '-m', 'eadata', *args],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr_file,
+        )
+        _, status, rusage = os.wait4(proc.pid, 0)
+        wall_time = time.perf_counter() - t_start
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode(errors='replace')
+
+    # Decode the wait status like `Popen.returncode` (negative signal number if killed)
+    proc.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+    if proc.returncode != 0:
+        raise RuntimeError(f"`eadata {' '.join(args)}` failed:\n{stderr}")
+
+    return {
+        'wall_s': wall_time,
+        'cpu_s': rusage.ru_utime + rusage.ru_stime,
+        'peak_rss_mb': rusage.ru_maxrss / 1024,
+    }
+
+
+def get_parquet_totals(data_dir: Path) -> Tuple[int, int]:
+    """Total number of samples (rows x columns) and bytes of parquet files in a data tree."""
+    n_samples, n_bytes = 0, 0
+    for fp in (data_dir / 'parquet').glob('**/*.parquet'):
+        metadata = pq.read_metadata(fp)
+        n_samples += metadata.num_rows * metadata.num_columns
+        n_bytes += fp.stat().st_size
+    return n_samples, n_bytes
+
+
+def run_benchmarks(
+    hours: List[float],
+    n_sessions: int = 4,
+    stages: Sequence[str] = tuple(STAGES),
+    multiproc: bool = False,
+    corrupt_prob: float = 0.0,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """Runs each stage on synthetic datasets of increasing size.
+
+    Args:
+        hours: Session durations (in hours) of each dataset.
+        n_sessions: Number of sessions in each dataset.
+        stages: Stages to run, in order.
+        multiproc: Whether to convert with multiprocessing.
+        corrupt_prob: Probability that each EDF file is corrupt.
+        seed: Random seed.
+
+    Returns:
+        List of results, one per dataset and stage.
+    """
+    results = []
+    for session_hours in hours:
+        with tempfile.TemporaryDirectory(prefix='eadata-bench-') as tmp_dir:
+            data_dir = Path(tmp_dir)
+            totals = generate_dataset(
+                data_dir,
+                patient_ids=[PATIENT_ID],
+                n_sessions=n_sessions,
+                hours=session_hours,
+                corrupt_prob=corrupt_prob,
+                seed=seed,
+            )
+            for stage in stages:
+                if stage in ['ambtimes', 'convert']:
+                    n_samples, n_bytes = totals['samples'], totals['bytes']
+                else:
+                    n_samples, n_bytes = get_parquet_totals(data_dir)
+
+                result = run_stage(get_stage_args(stage, multiproc), data_dir)
+                results.append({
+                    'stage': stage,
+                    'session_hours': session_hours,
+                    'n_sessions': n_sessions,
+                    'input_samples': n_samples,
+                    'input_bytes': n_bytes,
+                    **result,
+                    'samples_per_s': n_samples / result['wall_s'],
+                    'bytes_per_s': n_bytes / result['wall_s'],
+                })
+                print(_format_row(results[-1]), flush=True)
+    return results
+
+
+def _format_row(result: Dict[str, Any]) -> str:
+    return (
+        f"{result['stage']:>8} {result['session_hours']:>6.1f}h x {result['n_sessions']:<3d}"
+        f"{result['wall_s']:>9.2f}s {result['peak_rss_mb']:>9.1f}MB"
+        f"{result['samples_per_s'] / 1e6:>10.2f}M samples/s"
+        f"{result['bytes_per_s'] / 1024**2:>10.2f}MB/s"
+    )
+
+
+def main(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--hours', type=float, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--n-sessions', type=int, default=4)
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--multiproc', action='store_true')
+    parser.add_argument('--corrupt-prob', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, default=None, help="Path to write csv of results.")
+    args = parser.parse_args(args)
+
+    results = run_benchmarks(
+        args.hours,
+        n_sessions=args.n_sessions,
+        stages=args.stages,
+        multiproc=args.multiproc,
+        corrupt_prob=args.corrupt_prob,
+        seed=args.seed,
+    )
+
+    if args.output is not None:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,8 @@ all patients.
 
 Usage:
 
-    $ python3 scripts/evaluation.py
+    $ python3 scripts/evaluation.py [--plot] [--n-bootstrap N] [--workers N]
+    $ python3 scripts/evaluation.py --leaderboard <SUBMISSIONS_DIR> [--workers N]
 
 Assumes that contestant has written a script that can generate predictions from their model for
 files in `./data/test` (which they don't have access to). Files in `./data/test` follow the same
@@ -21,14 +22,41 @@ filepath, prediction
 test/<PATIENT_ID>/<SESSION_ID>/UTC-YYYY_MM_DD-hh_mm_ss.parquet, <PREDICTION>
 ...
 ```
+Predictions may also be submitted as a parquet file with the same columns. Submissions are
+streamed and validated by `scoring.read_predictions`, which reports any missing, extra or
+duplicate filepaths.
+
+Scores are computed by `scoring.score` and saved to `metrics.csv` in the output dir, along with
+bootstrap confidence intervals of the AUCs (`ROC_AUC_lower` and `ROC_AUC_upper`, see
+`scoring.bootstrap_ci`, disabled with `--n-bootstrap 0`). If `--plot` is given, ROC curves are also
+saved as `roc_<PATIENT_ID>.png`.
+
+In leaderboard mode, every csv or parquet file in `<SUBMISSIONS_DIR>` is scored as a predictions
+file (in a process pool, against labels loaded once, see `scoring.load_labels`), and the results
+are saved to `leaderboard.csv` in the output dir, ranked by the ROC AUC across all patients.
+Submissions that fail validation are listed last with their error.
 """
 
+import argparse
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-from sklearn.metrics import roc_curve, roc_auc_score
+import pyarrow as pa
+
+from scoring import (
+    PARQUET_SUFFIXES,
+    POOLED_ID,
+    bootstrap_ci,
+    load_labels,
+    plot_roc,
+    read_predictions,
+    score,
+)
 
 PREDICTIONS_PATH = "./predictions.csv"
 OUTPUT_DIR = "./data/output"
@@ -36,79 +64,120 @@ OUTPUT_DIR = "./data/output"
 LABELS_DIR = "./data/artifacts"
 PATIENT_IDS = ["1110", "1869", "1876", "1904", "1965", "2002"]
 
-Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
-
-# Configure logging
 logger = logging.getLogger()
-logging.basicConfig(
-    format="%(asctime)s - %(levelname)s - %(name)s: %(message)s",
-    level=logging.INFO,
-    force=True,
-)
 
-logger.info(f"Loading predictions from {PREDICTIONS_PATH}")
-assert Path(PREDICTIONS_PATH).exists(), f"File at {PREDICTIONS_PATH = } does not exist."
-input_csv = pd.read_csv(PREDICTIONS_PATH)
-
-logger.info("Verifying predictions input")
-assert all(
-    col in ["filepath", "prediction"] for col in input_csv.columns.tolist()
-), f"Incorrect columns in {PREDICTIONS_PATH}, expected 'filepath, prediction'."
-assert not input_csv.empty, "Empty predictions file loaded."
-assert (input_csv["prediction"] <= 1).all() and (
-    input_csv["prediction"] >= 0
-).all(), f"Invalid predictions detected in {PREDICTIONS_PATH}."
-assert (
-    input_csv["filepath"].apply(lambda fp: fp.split("/")[0]).isin(PATIENT_IDS)
-).all(), "Expected first dir in each entry in 'filepath' to have valid patient_id."
-
-logger.info("Loading validation labels for all patients")
-results = pd.DataFrame()
-for pid in PATIENT_IDS:
-    labels = pd.read_csv(Path(LABELS_DIR) / f"{pid}_test_labels.csv")
-    results = pd.concat([results, labels])
-
-logger.info("Checking all validation files have a prediction")
-results = results.sort_values("filepath").reset_index(drop=True)
-input_csv = input_csv.sort_values("filepath").reset_index(drop=True)
-assert input_csv["filepath"].equals(
-    results["filepath"]
-), f"Expected {PREDICTIONS_PATH} to contain predictions for all files in test splits."
-
-results["prediction"] = input_csv["prediction"]
-results["patient_id"] = results["filepath"].apply(lambda fp: fp.split("/")[0])
-
-metrics = [{"patient_id": pid, "ROC_AUC": None} for pid in PATIENT_IDS + ["all"]]
-metrics = pd.DataFrame(metrics)
-metrics.set_index("patient_id", inplace=True)
-
-for pid in metrics.index:
-    logger.info(f"Calculating metrics for {pid}")
-    selection = results[results["patient_id"] == pid] if pid != "all" else results
-    title = f"Patient {pid}" if pid != "all" else "All patients"
-
-    fpr, tpr, _ = roc_curve(selection["label"], selection["prediction"])
-    auc = roc_auc_score(selection["label"], selection["prediction"])
-    metrics["ROC_AUC"][pid] = auc
-
-    trace = go.Scatter(
-        x=tpr,
-        y=fpr,
-        mode="lines",
+# Labels shared by leaderboard workers, set by `_init_worker`
+_label_index = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--predictions", default=PREDICTIONS_PATH)
+    parser.add_argument("--labels-dir", default=LABELS_DIR)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--plot", action="store_true", help="Save ROC curves as PNGs.")
+    parser.add_argument("--leaderboard", default=None, help="Directory of submissions to rank.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--n-bootstrap", type=int, default=1000, help="Bootstrap resamples.")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Configure logging
+    logging.basicConfig(
+        format="%(asctime)s - %(levelname)s - %(name)s: %(message)s",
+        level=logging.INFO,
+        force=True,
     )
-    layout = {
-        "title": " ".join([title, "validation ROC", f"(AUC = {auc})"]),
-        "xaxis_title": "TPR",
-        "yaxis_title": "FPR",
-        "showlegend": False,
-    }
-    fig = go.Figure(
-        data=[trace],
-        layout=layout,
+    Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+
+    logger.info("Loading validation labels for all patients")
+    label_index = load_labels(args.labels_dir, PATIENT_IDS)
+
+    if args.leaderboard is not None:
+        leaderboard(args.leaderboard, label_index, args.output_dir, args.workers)
+        return
+
+    _, labels, patient_ids = label_index
+    logger.info(f"Loading predictions from {args.predictions}")
+    predictions = read_predictions(args.predictions, label_index[0])
+
+    logger.info("Calculating metrics")
+    metrics, curves = score(labels, predictions, patient_ids, curves=args.plot)
+    if args.n_bootstrap > 0:
+        logger.info(f"Estimating confidence intervals from {args.n_bootstrap} resamples")
+        ci = bootstrap_ci(
+            labels,
+            predictions,
+            patient_ids,
+            n_resamples=args.n_bootstrap,
+            confidence=args.confidence,
+            seed=args.seed,
+            workers=args.workers or 1,
+        )
+        metrics = metrics.merge(ci, on="patient_id")
+
+    for pid, auc in zip(metrics["patient_id"], metrics["ROC_AUC"]):
+        logger.info(f"ROC AUC for {pid}: {auc}")
+        if args.plot:
+            title = f"Patient {pid}" if pid != POOLED_ID else "All patients"
+            title = " ".join([title, "validation ROC", f"(AUC = {auc})"])
+            plot_roc(curves[pid], title, Path(args.output_dir) / f"roc_{pid}.png")
+
+    logger.info(f"Saving outputs to {args.output_dir}")
+    metrics.to_csv(Path(args.output_dir) / "metrics.csv", index=False)
+
+    logger.info(f"PASS!")
+
+
+def leaderboard(
+    submissions_dir: Union[str, Path],
+    label_index: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    output_dir: Union[str, Path],
+    workers: Optional[int] = None,
+):
+    """Scores every submission in a directory and saves them ranked to `leaderboard.csv`."""
+    submissions = sorted(
+        fp for fp in Path(submissions_dir).iterdir() if fp.suffix in [".csv", *PARQUET_SUFFIXES]
     )
-    fig.write_image(Path(OUTPUT_DIR) / f"roc_{pid}.png")
-
-logger.info(f"Saving outputs to {OUTPUT_DIR}")
-metrics.to_csv(Path(OUTPUT_DIR) / "metrics.csv", index=False)
-
-logger.info(f"PASS!")
+    assert len(submissions) > 0, f"No submissions found in {submissions_dir}."
+    logger.info(f"Scoring {len(submissions)} submissions from {submissions_dir}")
+
+    # Suppress per-submission logs from workers
+    logger.setLevel(logging.WARNING)
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(label_index,)) as pool:
+        rows = list(pool.map(_score_submission, submissions))
+    logger.setLevel(logging.INFO)
+
+    columns = ["submission", *np.unique(label_index[2]).tolist(), POOLED_ID, "error"]
+    results = pd.DataFrame(rows, columns=columns)
+    results.insert(0, "rank", results[POOLED_ID].rank(ascending=False, method="min"))
+    results = results.sort_values(["rank", "submission"], na_position="last")
+    results["rank"] = results["rank"].astype("Int64")
+
+    n_failed = int(results["error"].notna().sum())
+    if n_failed > 0:
+        logger.warning(f"{n_failed} submissions failed validation")
+    logger.info(f"Saving leaderboard to {output_dir}")
+    results.to_csv(Path(output_dir) / "leaderboard.csv", index=False)
+
+
+def _init_worker(label_index: Tuple[np.ndarray, np.ndarray, np.ndarray]):
+    global _label_index
+    _label_index = label_index
+
+
+def _score_submission(predictions_path: Path) -> Dict[str, Any]:
+    """Scores a submission in a leaderboard worker, recording the error if it's invalid."""
+    row = {"submission": predictions_path.name}
+    try:
+        predictions = read_predictions(predictions_path, _label_index[0])
+    except (AssertionError, ValueError, TypeError, OSError, pa.ArrowException) as err:
+        return {**row, "error": str(err) or type(err).__name__}
+    metrics, _ = score(_label_index[1], predictions, _label_index[2])
+    return {**row, **dict(zip(metrics["patient_id"], metrics["ROC_AUC"])), "error": None}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+"""Vectorised ROC scoring of predictions, per patient and pooled across patients.
+
+Predictions are sorted once, and the ROC curve and AUC of every patient are computed together from
+cumulative sums of the labels within each patient, rather than scoring each patient's slice
+separately. AUCs are computed by the trapezoidal rule over tied predictions, so they match
+`sklearn.metrics.roc_auc_score`, and curves match `sklearn.metrics.roc_curve`.
+
+Usage:
+
+    from scoring import score
+    metrics, curves = score(labels, predictions, patient_ids, curves=True)
+
+Labels are loaded once with `load_labels`, which caches them as sorted filepath keys and int8
+labels, so that many submissions can be scored against them.
+
+Submissions (csv or parquet) are read with `read_predictions`, which streams them in batches with
+Arrow and hash joins each batch to the label filepaths, so memory doesn't grow with the size of a
+submission.
+
+Confidence intervals of AUCs are estimated with `bootstrap_ci`, which resamples each patient
+separately and computes the AUCs of a chunk of resamples at once from resample counts of the
+samples in prediction order.
+"""
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+POOLED_ID = "all"
+PREDICTION_COLUMNS = ["filepath", "prediction"]
+PARQUET_SUFFIXES = [".parquet", ".pq"]
+
+# Number of offending filepaths listed in validation errors
+N_EXAMPLES = 5
+# Number of distinct extra filepaths kept to find duplicates among them (bounds memory used by a
+# submission with many unknown filepaths)
+MAX_EXTRA_TRACKED = 1 << 16
+
+
+def load_labels(
+    labels_dir: Union[str, Path],
+    patient_ids: List[str],
+    split: str = "test",
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Loads labels of all patients in a split, sorted by filepath.
+
+    Labels are cached in `<labels_dir>/<split>_labels.npz`, which is rebuilt whenever the size or
+    modification time of any `<pid>_<split>_labels.csv` changes.
+
+    Args:
+        labels_dir: Directory of labels csvs (see `eadata label`).
+        patient_ids: Patient IDs.
+        split: Name of split.
+
+    Returns:
+        Tuple of sorted filepaths (unicode array), labels (int8 array) and patient ID of each file.
+    """
+    labels_paths = [Path(labels_dir) / f"{pid}_{split}_labels.csv" for pid in patient_ids]
+    stamps = np.array([[p.stat().st_size, p.stat().st_mtime_ns] for p in labels_paths], np.int64)
+
+    cache_path = Path(labels_dir) / f"{split}_labels.npz"
+    if cache_path.exists():
+        with np.load(cache_path) as cache:
+            if (
+                cache["patient_ids"].tolist() == list(patient_ids)
+                and np.array_equal(cache["stamps"], stamps)
+            ):
+                return cache["filepaths"], cache["labels"], cache["file_patient_ids"]
+
+    labels = pd.concat([pd.read_csv(p) for p in labels_paths])
+    filepaths = labels["filepath"].to_numpy().astype(str)
+    order = np.argsort(filepaths, kind="stable")
+    filepaths = filepaths[order]
+    labels = labels["label"].to_numpy().astype(np.int8)[order]
+    file_patient_ids = np.char.partition(filepaths, "/")[:, 0]
+
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp.npz")
+    np.savez(
+        tmp_path,
+        filepaths=filepaths,
+        labels=labels,
+        file_patient_ids=file_patient_ids,
+        patient_ids=np.array(patient_ids, dtype=str),
+        stamps=stamps,
+    )
+    tmp_path.replace(cache_path)
+    return filepaths, labels, file_patient_ids
+
+
+def read_predictions(
+    predictions_path: Union[str, Path],
+    filepaths: np.ndarray,
+    batch_size: int = 1 << 16,
+) -> np.ndarray:
+    """Reads predictions of a submission and aligns them to labels.
+
+    The submission is read in batches (parquet if its suffix is in PARQUET_SUFFIXES, otherwise
+    csv), and each batch is joined to `filepaths` with an Arrow hash lookup. Validation is done on
+    the whole submission before failing, reporting every kind of problem at once.
+
+    Args:
+        predictions_path: Path to submission with columns PREDICTION_COLUMNS.
+        filepaths: Filepaths of labels, see `load_labels`.
+        batch_size: Number of rows read at a time (approximately, for csv).
+
+    Returns:
+        Predictions in the same order as `filepaths`.
+
+    Raises:
+        AssertionError: If the submission has the wrong columns (or column types) or no rows, or
+            if there are any missing, extra or duplicate filepaths, or predictions that aren't
+            between 0 and 1.
+    """
+    predictions_path = Path(predictions_path)
+    assert predictions_path.exists(), f"File at {predictions_path} does not exist."
+
+    label_keys = pa.array(filepaths, type=pa.string())
+    predictions = np.full(len(filepaths), np.nan)
+    n_seen = np.zeros(len(filepaths), dtype=np.int64)
+    extra_counts, invalid = {}, []
+    n_rows = n_invalid = n_extra = n_untracked_duplicate = 0
+    for batch in _iter_prediction_batches(predictions_path, batch_size):
+        n_rows += batch.num_rows
+        batch_filepaths = batch.column("filepath")
+        positions = pc.fill_null(pc.index_in(batch_filepaths, value_set=label_keys), -1)
+        positions = positions.to_numpy()
+        values = batch.column("prediction").to_numpy(zero_copy_only=False).astype(np.float64)
+
+        is_known = positions >= 0
+        is_valid = (values >= 0) & (values <= 1)
+        if not is_known.all():
+            counts = pc.value_counts(batch_filepaths.filter(pa.array(~is_known)))
+            for fp, count in zip(*[counts.field(f).to_pylist() for f in ["values", "counts"]]):
+                if fp in extra_counts:
+                    extra_counts[fp] += count
+                    continue
+                n_extra += 1
+                if len(extra_counts) < MAX_EXTRA_TRACKED:
+                    extra_counts[fp] = count
+                else:
+                    n_untracked_duplicate += count > 1
+        if not is_valid.all():
+            n_invalid += int((~is_valid).sum())
+            examples = batch_filepaths.filter(pa.array(~is_valid))[:N_EXAMPLES - len(invalid)]
+            invalid.extend(examples.to_pylist())
+
+        np.add.at(n_seen, positions[is_known], 1)
+        predictions[positions[is_known]] = values[is_known]
+
+    assert n_rows > 0, "Empty predictions file loaded."
+
+    missing = filepaths[n_seen == 0].tolist()
+    duplicate = [*filepaths[n_seen > 1].tolist(), *[fp for fp, n in extra_counts.items() if n > 1]]
+    errors = [
+        f"{n_offending} {kind} filepaths, e.g. {examples[:N_EXAMPLES]}"
+        for kind, n_offending, examples in [
+            ("missing", len(missing), missing),
+            ("extra", n_extra, list(extra_counts)),
+            ("duplicate", len(duplicate) + n_untracked_duplicate, duplicate),
+        ] if n_offending > 0
+    ]
+    if len(extra_counts) == MAX_EXTRA_TRACKED:
+        errors.append(f"(extras only deduplicated among the first {MAX_EXTRA_TRACKED} of them)")
+    if n_invalid > 0:
+        errors.append(f"{n_invalid} predictions not between 0 and 1, e.g. for {invalid}")
+    assert len(errors) == 0, f"Invalid predictions in {predictions_path}:\n" + "\n".join(errors)
+    return predictions
+
+
+def _iter_prediction_batches(predictions_path: Path, batch_size: int) -> Iterator[pa.RecordBatch]:
+    """Iterates over record batches of a submission with columns PREDICTION_COLUMNS."""
+    if predictions_path.suffix in PARQUET_SUFFIXES:
+        pq_file = pq.ParquetFile(predictions_path)
+        schema = pq_file.schema_arrow
+        columns = schema.names
+        if sorted(columns) == sorted(PREDICTION_COLUMNS):
+            filepath_type, prediction_type = [schema.field(c).type for c in PREDICTION_COLUMNS]
+            assert pa.types.is_string(filepath_type) or pa.types.is_large_string(filepath_type), \
+                f"Expected string filepaths in {predictions_path}, got {filepath_type}."
+            assert pa.types.is_floating(prediction_type) or pa.types.is_integer(prediction_type), \
+                f"Expected numeric predictions in {predictions_path}, got {prediction_type}."
+        batches = pq_file.iter_batches(batch_size=batch_size, columns=PREDICTION_COLUMNS)
+    else:
+        batches = pv.open_csv(
+            predictions_path,
+            read_options=pv.ReadOptions(block_size=batch_size * 64),
+            convert_options=pv.ConvertOptions(
+                column_types={"filepath": pa.string(), "prediction": pa.float64()},
+            ),
+        )
+        columns = batches.schema.names
+
+    assert sorted(columns) == sorted(PREDICTION_COLUMNS), \
+        f"Incorrect columns in {predictions_path}, expected 'filepath, prediction'."
+    yield from batches
+
+
+def score(
+    labels: np.ndarray,
+    predictions: np.ndarray,
+    patient_ids: np.ndarray,
+    curves: bool = False,
+) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """Scores predictions of each patient and of all patients pooled together.
+
+    Args:
+        labels: Binary labels of samples.
+        predictions: Predicted probabilities of samples.
+        patient_ids: Patient ID of each sample.
+        curves: Whether to also return ROC curves.
+
+    Returns:
+        Tuple of a metrics dataframe with columns `patient_id` and `ROC_AUC` (a row for each
+        patient in sorted order, then a row for POOLED_ID), and a dictionary mapping the same IDs
+        to ROC curves (dataframes with columns `fpr`, `tpr` and `threshold`, empty if not
+        `curves`). AUCs are NaN for groups without both positive and negative samples.
+
+    Examples:
+        Tied and constant predictions (checked with `python3 -m doctest scripts/scoring.py`):
+
+        >>> metrics, curves = score([0, 1, 0, 1], [.2, .8, .8, .8], ['a', 'a', 'b', 'b'], True)
+        >>> metrics["ROC_AUC"].tolist()
+        [1.0, 0.5, 0.75]
+        >>> curves["b"][["fpr", "tpr"]].values.tolist()
+        [[0.0, 0.0], [1.0, 1.0]]
+        >>> score([0, 1, 0], [.5, .5, .5], ['a'] * 3, curves=True)[1]["a"]["tpr"].tolist()
+        [0.0, 1.0]
+    """
+    labels = np.asarray(labels, dtype=np.int8)
+    predictions = np.asarray(predictions, dtype=np.float64)
+    names, groups = np.unique(np.asarray(patient_ids).astype(str), return_inverse=True)
+    assert labels.shape == predictions.shape == groups.shape, "Expected inputs of same length."
+
+    # Sort predictions once (descending), then stably by patient so that each patient's samples
+    # are contiguous and still in descending order of prediction
+    order = np.argsort(-predictions, kind='stable')
+    by_patient = order[np.argsort(groups[order], kind='stable')]
+
+    pooled_auc, pooled_points = _grouped_roc(labels[order], predictions[order], None, 1)
+    aucs, points = _grouped_roc(
+        labels[by_patient],
+        predictions[by_patient],
+        groups[by_patient],
+        len(names),
+    )
+
+    ids = [*names.tolist(), POOLED_ID]
+    metrics = pd.DataFrame({"patient_id": ids, "ROC_AUC": np.r_[aucs, pooled_auc]})
+    roc_curves = {}
+    if curves:
+        roc_curves = {pid: _to_curve(*p) for pid, p in zip(ids, [*points, *pooled_points])}
+    return metrics, roc_curves
+
+
+def _grouped_roc(
+    labels: np.ndarray,
+    predictions: np.ndarray,
+    groups: Optional[np.ndarray],
+    n_groups: int,
+) -> Tuple[np.ndarray, List[tuple]]:
+    """Computes ROC AUC and curve points of groups of samples.
+
+    Args:
+        labels: Labels sorted by group, then by descending prediction.
+        predictions: Predictions in the same order.
+        groups: Group index (0 to n_groups - 1) of each sample, or None for a single group.
+        n_groups: Number of groups.
+
+    Returns:
+        Tuple of AUC of each group, and (false positive counts, true positive counts, thresholds,
+        number of negatives, number of positives) at each distinct prediction of each group.
+    """
+    if groups is None:
+        groups = np.zeros(len(labels), dtype=np.int64)
+
+    # Cumulative positives within each group, by subtracting the total before each group starts
+    tps = np.cumsum(labels, dtype=np.int64)
+    starts = np.searchsorted(groups, np.arange(n_groups + 1))
+    tps -= np.r_[0, tps][starts[:-1]][groups]
+    fps = np.arange(1, len(labels) + 1) - starts[:-1][groups] - tps
+
+    # Curve points are at the last sample of each run of tied predictions in a group
+    is_last = np.r_[(predictions[1:] != predictions[:-1]) | (groups[1:] != groups[:-1]), True]
+    idx = np.flatnonzero(is_last)
+    point_groups, tp, fp = groups[idx], tps[idx], fps[idx]
+
+    # Trapezoidal area between consecutive points of each group (the first from the origin)
+    is_first = np.r_[True, point_groups[1:] != point_groups[:-1]]
+    tp_prev = np.where(is_first, 0, np.r_[0, tp[:-1]])
+    fp_prev = np.where(is_first, 0, np.r_[0, fp[:-1]])
+    areas = (fp - fp_prev) * (tp + tp_prev) / 2
+    area = np.bincount(point_groups, weights=areas, minlength=n_groups)
+
+    n_pos = np.bincount(groups, weights=labels, minlength=n_groups)
+    n_neg = np.diff(starts) - n_pos
+    with np.errstate(divide='ignore', invalid='ignore'):
+        aucs = np.where(n_pos * n_neg > 0, area / (n_pos * n_neg), np.nan)
+
+    bounds = np.searchsorted(point_groups, np.arange(n_groups + 1))
+    points = [
+        (fp[i:j], tp[i:j], predictions[idx[i:j]], n_neg[k], n_pos[k])
+        for k, (i, j) in enumerate(zip(bounds[:-1], bounds[1:]))
+    ]
+    return aucs, points
+
+
+def _to_curve(
+    fp: np.ndarray,
+    tp: np.ndarray,
+    thresholds: np.ndarray,
+    n_neg: float,
+    n_pos: float,
+) -> pd.DataFrame:
+    """Builds ROC curve from its points, dropping collinear points and starting at the origin.
+
+    Curves with fewer than 3 points (e.g. when all predictions are equal) have no collinear points.
+    """
+    if len(fp) > 2:
+        keep = np.r_[True, np.diff(fp, 2).astype(bool) | np.diff(tp, 2).astype(bool), True]
+        fp, tp, thresholds = fp[keep], tp[keep], thresholds[keep]
+    fp, tp, thresholds = np.r_[0, fp], np.r_[0, tp], np.r_[np.inf, thresholds]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({"fpr": fp / n_neg, "tpr": tp / n_pos, "threshold": thresholds})
+
+
+def bootstrap_ci(
+    labels: np.ndarray,
+    predictions: np.ndarray,
+    patient_ids: np.ndarray,
+    n_resamples: int = 1000,
+    confidence: float = 0.95,
+    seed: int = 0,
+    workers: int = 1,
+    chunk_size: int = 100,
+) -> pd.DataFrame:
+    """Estimates percentile bootstrap confidence intervals of ROC AUCs.
+
+    Each resample draws samples with replacement within each patient (keeping the number of samples
+    of each patient fixed), and the pooled AUC of a resample is computed over all of its patients.
+    Resamples are drawn in chunks, each from its own seed spawned from `seed`, so results are
+    reproducible for a given `seed` and `chunk_size` (but don't depend on `workers`).
+
+    Args:
+        labels: Binary labels of samples.
+        predictions: Predicted probabilities of samples.
+        patient_ids: Patient ID of each sample.
+        n_resamples: Number of bootstrap resamples.
+        confidence: Confidence level of intervals.
+        seed: Seed of random number generator.
+        workers: Number of processes to compute chunks of resamples in.
+        chunk_size: Number of resamples computed at once.
+
+    Returns:
+        Dataframe with columns `patient_id`, `ROC_AUC_lower` and `ROC_AUC_upper`, with rows in the
+        same order as the metrics of `score`. Resamples without both classes are ignored, and
+        bounds are NaN if there are none left.
+    """
+    assert 0 < confidence < 1, "Expected `confidence` between 0 and 1."
+    labels = np.asarray(labels, dtype=np.int8)
+    predictions = np.asarray(predictions, dtype=np.float64)
+    names, groups = np.unique(np.asarray(patient_ids).astype(str), return_inverse=True)
+
+    # Put samples in order of patient, then ascending prediction, so each patient's resample
+    # counts are a contiguous slice of columns
+    order = np.lexsort((predictions, groups))
+    labels, predictions, groups = labels[order], predictions[order], groups[order]
+    bounds = np.searchsorted(groups, np.arange(len(names) + 1))
+
+    chunks = [min(chunk_size, n_resamples - i) for i in range(0, n_resamples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    args = [(labels, predictions, bounds, n, chunk_seed) for n, chunk_seed in zip(chunks, seeds)]
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            aucs = list(pool.map(_bootstrap_chunk, *zip(*args)))
+    else:
+        aucs = [_bootstrap_chunk(*chunk_args) for chunk_args in args]
+
+    tail = (1 - confidence) / 2 * 100
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        lower, upper = np.nanpercentile(np.concatenate(aucs), [tail, 100 - tail], axis=0)
+    return pd.DataFrame({
+        "patient_id": [*names.tolist(), POOLED_ID],
+        "ROC_AUC_lower": lower,
+        "ROC_AUC_upper": upper,
+    })
+
+
+def _bootstrap_chunk(
+    labels: np.ndarray,
+    predictions: np.ndarray,
+    bounds: np.ndarray,
+    n_resamples: int,
+    seed: np.random.SeedSequence,
+) -> np.ndarray:
+    """Computes AUCs of a chunk of resamples, see `bootstrap_ci`.
+
+    Args:
+        labels: Labels sorted by patient, then by ascending prediction.
+        predictions: Predictions in the same order.
+        bounds: Position of the first sample of each patient, followed by the number of samples.
+        n_resamples: Number of resamples in chunk.
+        seed: Seed of chunk.
+
+    Returns:
+        Array with shape (n_resamples, n_patients + 1) of the AUC of each patient, and of all
+        patients, in each resample.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Number of times each sample is drawn in each resample, drawing within each patient
+    counts = np.empty((n_resamples, len(labels)), dtype=np.int64)
+    aucs = []
+    for i, j in zip(bounds[:-1], bounds[1:]):
+        draws = rng.integers(0, j - i, size=(n_resamples, j - i))
+        draws += np.arange(n_resamples)[:, None] * (j - i)
+        counts[:, i:j] = np.bincount(draws.ravel(), minlength=draws.size).reshape(draws.shape)
+        aucs.append(_resampled_auc(counts[:, i:j], labels[i:j], predictions[i:j]))
+
+    pooled = np.argsort(predictions, kind='stable')
+    aucs.append(_resampled_auc(counts[:, pooled], labels[pooled], predictions[pooled]))
+    return np.stack(aucs, axis=1)
+
+
+def _resampled_auc(counts: np.ndarray, labels: np.ndarray, predictions: np.ndarray) -> np.ndarray:
+    """Computes ROC AUCs of resamples from how many times each sample is drawn.
+
+    The AUC is the probability that a positive is ranked above a negative (counting ties as half),
+    so each drawn positive is credited with the drawn negatives ranked below its group of tied
+    predictions, plus half of those within it. These are read off the cumulative negative counts
+    at the bounds of the tie groups of positives.
+
+    Args:
+        counts: Number of times each sample is drawn, with shape (n_resamples, n_samples).
+        labels: Labels of samples, in ascending order of prediction.
+        predictions: Predictions of samples in ascending order.
+
+    Returns:
+        AUC of each resample (NaN if a resample doesn't have both classes).
+    """
+    n_samples = len(labels)
+    is_start = np.r_[True, predictions[1:] != predictions[:-1]]
+    tie_starts = np.flatnonzero(is_start)
+    tie_ends = np.r_[tie_starts[1:], n_samples]
+    tie = np.cumsum(is_start) - 1
+
+    pos = np.flatnonzero(labels)
+    neg_cum = np.zeros((len(counts), n_samples + 1), dtype=np.int64)
+    np.cumsum(counts * (1 - labels), axis=1, out=neg_cum[:, 1:])
+    below = neg_cum[:, tie_starts[tie[pos]]]
+    within = neg_cum[:, tie_ends[tie[pos]]] - below
+
+    pos_counts = counts[:, pos]
+    area = (pos_counts * (below + within / 2)).sum(axis=1)
+    n_pairs = pos_counts.sum(axis=1) * neg_cum[:, -1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(n_pairs > 0, area / n_pairs, np.nan)
+
+
+def plot_roc(curve: pd.DataFrame, title: str, path: Union[str, Path]) -> None:
+    """Saves an ROC curve as a PNG.
+
+    Matplotlib is only imported when plotting, and renders with the non-interactive Agg backend.
+
+    Args:
+        curve: ROC curve, see `score`.
+        title: Title of plot.
+        path: Path of PNG file.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(6, 6))
+    ax.plot(curve["tpr"], curve["fpr"])
+    ax.set(title=title, xlabel="TPR", ylabel="FPR", xlim=(0, 1), ylim=(0, 1))
+    fig.savefig(path, dpi=100)
+    plt.close(fig)